@@ -30,6 +30,8 @@ import datetime
 import os
 
 import mnetsuite
+import mnetsuite.replay
+import mnetsuite.bench
 
 def print_syntax():
 	print('Usage:\n'
@@ -39,12 +41,32 @@ def print_syntax():
 			'                [-c <config file>]\n'
 			'                [-t <diagram title>]\n'
 			'                [-C <catalog file>]\n'
+			'                [-w <workers>]\n'
+			'                [-s <snapshot file>]\n'
+			'                [-i <previous snapshot file>]\n'
+			'                [-p subnet|depth|core]\n'
+			'                [-S <record dir> | -P <replay dir>]\n'
+			'\n'
+			'  mnet.py render -s <snapshot file>\n'
+			'                 [-f <file>]\n'
+			'                 [-c <config file>]\n'
+			'                 [-t <diagram title>]\n'
+			'                 [-C <catalog file>]\n'
+			'                 [-p subnet|depth|core]\n'
 			'\n'
 			'  mnet.py tracemac -r <root IP>\n'
 			'                   -m <MAC Address>\n'
 			'                   [-c <config file>]\n'
+			'                   [-S <record dir> | -P <replay dir>]\n'
 			'\n'
 			'  mnet.py config\n'
+			'\n'
+			'  mnet.py bench [-n <devices,...>]\n'
+			'                [-w <workers>]\n'
+			'                [-l <latency ms>]\n'
+			'                [-L <loss %>]\n'
+			'                [-o <output dir>]\n'
+			'                [-i <churn %>]\n'
 		)
 
 
@@ -65,11 +87,17 @@ def main(argv):
 	if (mod == 'graph'):
 		print_banner()
 		graph(argv[1:])
+	elif (mod == 'render'):
+		print_banner()
+		render(argv[1:])
 	elif (mod == 'tracemac'):
 		print_banner()
 		tracemac(argv[1:])
 	elif (mod == 'config'):
 		generate_config()
+	elif (mod == 'bench'):
+		print_banner()
+		bench(argv[1:])
 	else:
 		print_banner()
 		print_syntax()
@@ -85,9 +113,15 @@ def graph(argv):
 	opt_title = 'MNet Network Diagram'
 	opt_conf = './mnet.conf'
 	opt_catalog = None
+	opt_workers = 1
+	opt_snapshot = None
+	opt_previous = None
+	opt_partition = None
+	opt_record = None
+	opt_replay = None
 
 	try:
-		opts, args = getopt.getopt(argv, 'f:d:r:t:F:c:C:')
+		opts, args = getopt.getopt(argv, 'f:d:r:t:F:c:C:w:s:i:p:S:P:')
 	except getopt.GetoptError:
 		print_syntax()
 		sys.exit(1)
@@ -105,8 +139,21 @@ def graph(argv):
 			opt_conf = arg
 		if (opt == '-C'):
 			opt_catalog = arg
-
-	if ((opt_root_ip == None) | (opt_dot == None)):
+		if (opt == '-w'):
+			opt_workers = int(arg)
+		if (opt == '-s'):
+			opt_snapshot = arg
+		if (opt == '-i'):
+			opt_previous = arg
+		if (opt == '-p'):
+			opt_partition = arg
+		if (opt == '-S'):
+			opt_record = arg
+		if (opt == '-P'):
+			opt_replay = arg
+
+	if ((opt_root_ip == None) | (opt_dot == None) |
+			((opt_partition != None) & (opt_partition not in mnetsuite.graph.PARTITION_MODES))):
 		print_syntax()
 		print('Invalid arguments.')
 		return
@@ -117,16 +164,40 @@ def graph(argv):
 	print('     Crawl depth: %s' % opt_depth)
 	print('   Diagram title: %s' % opt_title)
 	print('Out Catalog file: %s' % opt_catalog)
+	print('         Workers: %s' % opt_workers)
+	print('   Snapshot file: %s' % opt_snapshot)
+	print('  Previous crawl: %s' % opt_previous)
+	print('       Partition: %s' % opt_partition)
+	print_replay_opts(opt_record, opt_replay)
 
 	print('\n\n')
 
 	# load the config
 	if (graph.load_config(opt_conf) == 0):
 		return
+	if (opt_previous != None):
+		if (graph.load_previous(opt_previous) == 0):
+			return
 	graph.set_max_depth(opt_depth)
+	graph.set_workers(opt_workers)
+	graph.set_catalog(opt_catalog != None)
+	if (opt_partition != None):
+		graph.set_partition(opt_partition)
+
+	recorder = start_replay_opts(opt_record, opt_replay)
 
 	# start
 	graph.crawl(opt_root_ip)
+
+	if (recorder != None):
+		recorder.save(opt_record)
+
+	if (opt_previous != None):
+		print('Reused %i devices from the previous crawl.' % graph.get_reused_count())
+
+	if (opt_snapshot != None):
+		if (graph.save_snapshot(opt_snapshot) == 1):
+			print('Saved snapshot: %s' % opt_snapshot)
 		
 	# outputs
 	graph.output_stdout()
@@ -138,15 +209,79 @@ def graph(argv):
 		graph.output_catalog(opt_catalog)
 
 
+def render(argv):
+	graph = mnetsuite.mnet_graph()
+
+	opt_snapshot = None
+	opt_dot = None
+	opt_title = 'MNet Network Diagram'
+	opt_conf = './mnet.conf'
+	opt_catalog = None
+	opt_partition = None
+
+	try:
+		opts, args = getopt.getopt(argv, 's:f:t:c:C:p:')
+	except getopt.GetoptError:
+		print_syntax()
+		sys.exit(1)
+	for opt, arg in opts:
+		if (opt == '-s'):
+			opt_snapshot = arg
+		if (opt == '-f'):
+			opt_dot = arg
+		if (opt == '-t'):
+			opt_title = arg
+		if (opt == '-c'):
+			opt_conf = arg
+		if (opt == '-C'):
+			opt_catalog = arg
+		if (opt == '-p'):
+			opt_partition = arg
+
+	if ((opt_snapshot == None) | ((opt_partition != None) & (opt_partition not in mnetsuite.graph.PARTITION_MODES))):
+		print_syntax()
+		print('Invalid arguments.')
+		return
+
+	print('     Config file: %s' % opt_conf)
+	print('   Snapshot file: %s' % opt_snapshot)
+	print('     Output file: %s' % opt_dot)
+	print('   Diagram title: %s' % opt_title)
+	print('Out Catalog file: %s' % opt_catalog)
+	print('       Partition: %s' % opt_partition)
+
+	print('\n\n')
+
+	# the config only sets what the outputs show
+	if (os.path.isfile(opt_conf)):
+		graph.load_config(opt_conf)
+	if (opt_partition != None):
+		graph.set_partition(opt_partition)
+
+	if (graph.load_snapshot(opt_snapshot) == 0):
+		return
+
+	# outputs
+	graph.output_stdout()
+
+	if (opt_dot != None):
+		graph.output_dot(opt_dot, opt_title)
+
+	if (opt_catalog != None):
+		graph.output_catalog(opt_catalog)
+
+
 def tracemac(argv):
 	trace = mnetsuite.mnet_tracemac()
 
 	opt_root_ip = None
 	opt_conf = './mnet.conf'
 	opt_mac = None
+	opt_record = None
+	opt_replay = None
 
 	try:
-		opts, args = getopt.getopt(argv, 'r:c:m:')
+		opts, args = getopt.getopt(argv, 'r:c:m:S:P:')
 	except getopt.GetoptError:
 		print_syntax()
 		return
@@ -157,6 +292,10 @@ def tracemac(argv):
 			opt_conf = arg
 		if (opt == '-m'):
 			opt_mac = arg
+		if (opt == '-S'):
+			opt_record = arg
+		if (opt == '-P'):
+			opt_replay = arg
 
 	if ((opt_root_ip == None) | (opt_mac == None)):
 		print_syntax()
@@ -166,6 +305,7 @@ def tracemac(argv):
 	print('     Config file: %s' % opt_conf)
 	print('       Root node: %s' % opt_root_ip)
 	print('     MAC address: %s' % opt_mac)
+	print_replay_opts(opt_record, opt_replay)
 
 	print('\n\n')
 
@@ -177,17 +317,91 @@ def tracemac(argv):
 	# load config
 	trace.load_config(opt_conf)
 
+	recorder = start_replay_opts(opt_record, opt_replay)
+
 	# start
 	print('Start trace.')
 	print('------------')
 
 	ip = opt_root_ip
-	while (ip != None):
-		ip = trace.trace(ip, mac)
-		print('------------')
+	try:
+		while (ip != None):
+			ip = trace.trace(ip, mac)
+			print('------------')
+	finally:
+		trace.save_caches()
 
 	print('Trace complete.\n')
 
+	if (recorder != None):
+		recorder.save(opt_record)
+
+
+def print_replay_opts(opt_record, opt_replay):
+	if (opt_record != None):
+		print('     Record SNMP: %s' % opt_record)
+	if (opt_replay != None):
+		print('     Replay SNMP: %s' % opt_replay)
+
+#
+# Set up SNMP recording or replay.
+# Returns the recorder to save at the end, or None.
+#
+def start_replay_opts(opt_record, opt_replay):
+	if (opt_replay != None):
+		mnetsuite.replay.start_replay(opt_replay)
+	if (opt_record != None):
+		return mnetsuite.replay.start_recording()
+	return None
+
+
+def bench(argv):
+	opt_devices = '10,100,1000'
+	opt_workers = 1
+	opt_latency = 0
+	opt_loss = 0
+	opt_out = None
+	opt_churn = None
+
+	try:
+		opts, args = getopt.getopt(argv, 'n:w:l:L:o:i:')
+	except getopt.GetoptError:
+		print_syntax()
+		return
+	for opt, arg in opts:
+		if (opt == '-n'):
+			opt_devices = arg
+		if (opt == '-w'):
+			opt_workers = int(arg)
+		if (opt == '-l'):
+			opt_latency = float(arg)
+		if (opt == '-L'):
+			opt_loss = float(arg)
+		if (opt == '-o'):
+			opt_out = arg
+		if (opt == '-i'):
+			opt_churn = float(arg)
+
+	print('         Devices: %s' % opt_devices)
+	print('         Workers: %s' % opt_workers)
+	print('         Latency: %s ms' % opt_latency)
+	print('            Loss: %s %%' % opt_loss)
+	print('      Output dir: %s' % opt_out)
+	print('   Recrawl churn: %s' % ('-' if (opt_churn == None) else '%s %%' % opt_churn))
+
+	print('\n\n')
+
+	mnetsuite.bench.print_bench_header()
+	for devices in opt_devices.split(','):
+		r = mnetsuite.bench.run_bench_process(int(devices), opt_workers,
+				latency = opt_latency / 1000.0,
+				loss = opt_loss / 100.0,
+				out_dir = opt_out,
+				churn = opt_churn)
+		mnetsuite.bench.print_bench(r)
+		for e in r['errors']:
+			print('[E] %s' % e)
+
 
 def generate_config():
 	conf = mnetsuite.config.mnet_config()
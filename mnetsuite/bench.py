@@ -0,0 +1,504 @@
+#!/usr/bin/python
+
+'''
+	MNet Suite
+	bench.py
+
+	Michael Laforest
+	mjlaforest@gmail.com
+
+	Copyright (C) 2015 Michael Laforest
+
+	This program is free software; you can redistribute it and/or
+	modify it under the terms of the GNU General Public License
+	as published by the Free Software Foundation; either version 2
+	of the License, or (at your option) any later version.
+
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License
+	along with this program; if not, write to the Free Software
+	Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+'''
+
+import os
+import sys
+import time
+import struct
+import socket
+import resource
+import tempfile
+import collections
+import multiprocessing
+
+from pysnmp.proto import rfc1902
+
+from snmp import *
+from graph import mnet_graph
+from replay import mnet_snmp_recording, mnet_snmp_replay_engine
+
+BENCH_DOMAIN	= '.bench.net'
+BENCH_COMMUNITY	= 'bench'
+
+# ifIndex layout of a synthetic device
+BENCH_IF_UPLINK		= 1			# 1, 2 = uplinks
+BENCH_IF_DOWNLINK	= 10		# + child slot
+BENCH_IF_ACCESS		= 4			# access ports after the downlinks
+BENCH_IF_UPLINK_PO	= 1001		# Po1, LAG of uplink 1
+BENCH_IF_DOWN_PO	= 1100		# + child slot, LAG of each downlink
+BENCH_IF_LOOPBACK	= 5000
+BENCH_IF_SVI		= 6000
+
+BENCH_PLAT		= 'WS-C3850-48P'
+BENCH_IOS		= 'Cisco IOS Software, IOS-XE Software, Catalyst L3 Switch Software, Version 16.3.5, RELEASE'
+
+# of every BENCH_KIND_EVERY devices, one is a switch stack
+# and one a VSS pair
+BENCH_KIND_EVERY	= 10
+BENCH_KIND_STACK	= 5
+BENCH_KIND_VSS		= 7
+BENCH_STACK_MEMBERS	= 3
+BENCH_STACK_INDEX	= 1000		# + switch number, also the ENTITY-MIB index
+BENCH_STACK_IMG		= 'cat3k_caa-universalk9.16.03.05.SPA.bin'
+BENCH_VSS_PLAT		= 'VS-SUP2T-10G'
+BENCH_VSS_IOS		= 'Cisco IOS Software, s2t54 Software, Version 15.2(1)SY5, RELEASE'
+
+# recordings kept built at a time
+BENCH_CACHE_SIZE = 512
+
+# sysUpTime ticks when the neighbor tables were built, and per day
+BENCH_BOOT_TIME	= 6000
+BENCH_DAY		= 8640000
+
+
+class mnet_bench_topology:
+	'''
+	A synthetic Cisco-like network of devices built on demand.
+
+	Devices form a tree with fanout children each.  Every
+	redundancy'th device also has a second uplink to the next device
+	of its parent's level, so the crawl sees loops.  Each link is
+	a trunk in a LACP port-channel with a routed /30 on it, and is
+	advertised by CDP and, on every other device, by LLDP.
+	Some devices are switch stacks or VSS pairs, see kind().
+
+	Looks like the recordings dict of mnet_snmp_replay_engine:
+	get((ip, context)) returns the device's mnet_snmp_recording.
+
+	set_epoch() moves the network a day ahead with churn percent
+	of the devices having seen a CDP/LLDP change.
+	'''
+	def __init__(self, devices, fanout = 4, redundancy = 4):
+		self.devices = devices
+		self.fanout = max(2, fanout)
+		self.redundancy = redundancy
+		self.epoch = 0
+		self.churn = 0
+		self._cache = collections.OrderedDict()
+
+	def set_epoch(self, epoch, churn):
+		self.epoch = epoch
+		self.churn = churn
+		self._cache.clear()
+
+	#
+	# Returns True if device i saw a neighbor change in this epoch.
+	#
+	def changed(self, i):
+		if (self.epoch == 0):
+			return False
+		return ((i * 2654435761 + self.epoch) & 0xFFFF) % 100 < self.churn
+
+	def ip(self, i):
+		n = i + 1
+		return '10.%i.%i.%i' % ((n >> 16) & 0xFF, (n >> 8) & 0xFF, n & 0xFF)
+
+	def device(self, ip):
+		try:
+			a, b, c, d = [int(x) for x in ip.split('.')]
+		except ValueError:
+			return None
+		if (a != 10):
+			return None
+		i = ((b << 16) | (c << 8) | d) - 1
+		if ((i < 0) | (i >= self.devices)):
+			return None
+		return i
+
+	def name(self, i):
+		return 'sw%05i' % i
+
+	#
+	# 'stack', 'vss' or None for a single switch.
+	#
+	def kind(self, i):
+		k = i % BENCH_KIND_EVERY
+		if (k == BENCH_KIND_STACK):
+			return 'stack'
+		if (k == BENCH_KIND_VSS):
+			return 'vss'
+		return None
+
+	#
+	# Stack members of device i as (switch number, serial, platform).
+	#
+	def stack_members(self, i):
+		if (self.kind(i) != 'stack'):
+			return []
+		return [(n, 'FOC%07i%i' % (i, n), BENCH_PLAT) for n in xrange(1, BENCH_STACK_MEMBERS + 1)]
+
+	#
+	# VSS members of device i as (IOS, serial, platform).
+	#
+	def vss_members(self, i):
+		if (self.kind(i) != 'vss'):
+			return []
+		return [(BENCH_VSS_IOS, 'SAL%07i%i' % (i, n), BENCH_VSS_PLAT) for n in xrange(0, 2)]
+
+	def get(self, key, default = None):
+		ip, context = key
+		if (context != ''):
+			return default
+
+		i = self.device(ip)
+		if (i == None):
+			return default
+
+		rec = self._cache.pop(i, None)
+		if (rec == None):
+			rec = mnet_snmp_recording(self._build(i))
+		self._cache[i] = rec
+		if (len(self._cache) > BENCH_CACHE_SIZE):
+			self._cache.popitem(False)
+
+		return rec
+
+	#
+	# Links of device i as (local ifIndex, peer, peer ifIndex, peer slot).
+	# slot is the downlink number used on the parent side, or None.
+	#
+	def links(self, i):
+		f = self.fanout
+		ret = []
+
+		if (i > 0):
+			p = (i - 1) / f
+			ret.append((BENCH_IF_UPLINK, p, BENCH_IF_DOWNLINK + (i - 1) % f, None))
+			if (self._has_second(i)):
+				ret.append((BENCH_IF_UPLINK + 1, p + 1, BENCH_IF_DOWNLINK + f + (i - 1) % f, None))
+
+		for j in xrange(f * i + 1, min(f * i + f + 1, self.devices)):
+			s = (j - 1) % f
+			ret.append((BENCH_IF_DOWNLINK + s, j, BENCH_IF_UPLINK, s))
+
+		if (i > 0):
+			for j in xrange(f * (i - 1) + 1, min(f * (i - 1) + f + 1, self.devices)):
+				if (self._has_second(j) & (j != i)):
+					s = f + (j - 1) % f
+					ret.append((BENCH_IF_DOWNLINK + s, j, BENCH_IF_UPLINK + 1, None))
+
+		return ret
+
+	def _has_second(self, i):
+		if ((self.redundancy <= 0) | (i % self.redundancy != 0)):
+			return False
+		return ((i - 1) / self.fanout + 1 < i)
+
+	#
+	# Address of the /30 on the uplink port-channel of device i.
+	# The child gets .2 and the parent .1.
+	#
+	def _p2p(self, i, host):
+		n = i * 4 + host
+		return '100.%i.%i.%i' % (64 + ((n >> 16) & 0x3F), (n >> 8) & 0xFF, n & 0xFF)
+
+	def _build(self, i):
+		OS = rfc1902.OctetString
+		I = rfc1902.Integer
+		IP = rfc1902.IpAddress
+
+		d = {}
+		def put(oid, idx, v):
+			if (idx == None):
+				d[oid_to_tuple(oid)] = v
+			else:
+				d[oid_to_tuple(oid) + oid_to_tuple(str(idx))] = v
+
+		def add_ip(ip, ifidx, mask):
+			put(OID_IF_IP + '.1', ip, IP(ip))
+			put(OID_IF_IP_ADDR, ip, I(ifidx))
+			put(OID_IF_IP_NETM, ip, IP(mask))
+
+		def add_if(ifidx, name, iftype = 6):
+			put(OID_IFNAME, ifidx, OS(name))
+			put(OID_ETH_IF_DESC, ifidx, OS(name))
+			put(OID_ETH_IF_TYPE, ifidx, I(iftype))
+
+		name = self.name(i)
+		router = (i % 3 == 0)
+
+		put(OID_SYSNAME, None, OS(name + BENCH_DOMAIN))
+
+		# up for a day per epoch, neighbor tables last changed
+		# at boot or in this epoch
+		last_change = BENCH_BOOT_TIME
+		if (self.changed(i)):
+			last_change += self.epoch * BENCH_DAY
+		put(OID_SYS_UPTIME, None, rfc1902.TimeTicks(BENCH_BOOT_TIME + (self.epoch + 1) * BENCH_DAY))
+		put(OID_CDP_LAST_CHANGE, None, rfc1902.TimeTicks(last_change))
+		put(OID_LLDP_LAST_CHANGE, None, rfc1902.TimeTicks(last_change))
+		put(OID_IP_ROUTING, None, I(1 if router else 2))
+		put(OID_SYS_SERIAL, None, OS('FCW%07i' % i))
+		put(OID_SYS_BOOT, None, OS('flash:packages.conf'))
+		if (router):
+			put(OID_OSPF, None, I(1))
+			put(OID_OSPF_ID, None, IP(self.ip(i)))
+			put(OID_BGP_LAS, None, I(65000))
+
+		# entity MIB, chassis and one module
+		put(OID_ENTPHYENTRY_CLASS, 1, I(ENTPHYCLASS_CHASSIS))
+		put(OID_ENTPHYENTRY_CLASS, 2, I(ENTPHYCLASS_MODULE))
+		put(OID_ENTPHYENTRY_SOFTWARE, 1, OS(''))
+		put(OID_ENTPHYENTRY_SOFTWARE, 2, OS(BENCH_IOS))
+		put(OID_ENTPHYENTRY_SERIAL, 1, OS('FCW%07i' % i))
+		put(OID_ENTPHYENTRY_PLAT, 1, OS(BENCH_PLAT))
+
+		# stack members, the first one is the master
+		for (num, serial, plat) in self.stack_members(i):
+			idx = BENCH_STACK_INDEX + num
+			put(OID_STACK_NUM, idx, I(num))
+			put(OID_STACK_ROLE, idx, I(1 if (num == 1) else 2))
+			put(OID_STACK_PRI, idx, I(16 - num))
+			put(OID_STACK_MAC, idx, OS('\x00\x1b\x54' + struct.pack('>H', i & 0xFFFF) + chr(num)))
+			put(OID_STACK_IMG, idx, OS(BENCH_STACK_IMG))
+			put(OID_ENTPHYENTRY_SERIAL, idx, OS(serial))
+			put(OID_ENTPHYENTRY_PLAT, idx, OS(plat))
+
+		# VSS, a supervisor module per chassis
+		members = self.vss_members(i)
+		if (len(members) > 0):
+			put(OID_VSS_MODE, None, I(2))
+			put(OID_VSS_DOMAIN, None, I(100 + i % 100))
+			for m, (ios, serial, plat) in enumerate(members):
+				put(OID_ENTPHYENTRY_CLASS, 2 + m, I(ENTPHYCLASS_MODULE))
+				put(OID_ENTPHYENTRY_SOFTWARE, 2 + m, OS(ios))
+				put(OID_ENTPHYENTRY_SERIAL, 2 + m, OS(serial))
+				put(OID_ENTPHYENTRY_PLAT, 2 + m, OS(plat))
+
+		# management loopback and a user SVI
+		add_if(BENCH_IF_LOOPBACK, 'Loopback0', 24)
+		add_ip(self.ip(i), BENCH_IF_LOOPBACK, '255.255.255.255')
+		add_if(BENCH_IF_SVI, 'Vlan10', 53)
+		add_ip('172.%i.%i.1' % (16 + ((i >> 8) & 0x0F), i & 0xFF), BENCH_IF_SVI, '255.255.255.0')
+		put(OID_SVI_VLANIF, 10, I(BENCH_IF_SVI))
+
+		allowed = OS('\x7f' + '\xff' * 126 + '\xfe')
+		links = self.links(i)
+
+		for (port, peer, peer_port, slot) in links:
+			add_if(port, 'Te1/0/%i' % port)
+			put(OID_TRUNK_VTP, port, I(1))
+			put(OID_TRUNK_NATIVE, port, I(1))
+			put(OID_TRUNK_ALLOW, port, allowed)
+
+			# uplink 1 and each downlink to a primary child are
+			# in a port-channel with a routed /30
+			if (port == BENCH_IF_UPLINK):
+				po = BENCH_IF_UPLINK_PO
+				add_ip(self._p2p(i, 2), po, '255.255.255.252')
+			elif (slot != None):
+				po = BENCH_IF_DOWN_PO + slot
+				add_ip(self._p2p(peer, 1), po, '255.255.255.252')
+			else:
+				po = 0
+			put(OID_LAG_LACP, port, I(po))
+			if (po != 0):
+				add_if(po, 'Po%i' % (po - 1000), 53)
+
+			# CDP
+			cidx = '%i.%i' % (port, peer + 1)
+			peer_ip = socket.inet_aton(self.ip(peer))
+			put(OID_CDP_IPADDR, cidx, OS(peer_ip))
+			put(OID_CDP_IOS, cidx, OS(BENCH_IOS))
+			put(OID_CDP_DEVID, cidx, OS(self.name(peer) + BENCH_DOMAIN))
+			put(OID_CDP_DEVPORT, cidx, OS('TenGigabitEthernet1/0/%i' % peer_port))
+			put(OID_CDP_DEVPLAT, cidx, OS('cisco ' + BENCH_PLAT))
+
+			# LLDP
+			if (i % 2 == 0):
+				lidx = '%i.%i' % (port, peer + 1)
+				put(OID_LLDP_TYPE, lidx, I(4))
+				put(OID_LLDP_DEVID, lidx, OS('\x00\x1b\x54' + struct.pack('>I', peer)[1:]))
+				put(OID_LLDP_DEVPORT, lidx, OS('Te1/0/%i' % peer_port))
+				put(OID_LLDP_DEVNAME, lidx, OS(self.name(peer) + BENCH_DOMAIN))
+				put(OID_LLDP_DEVDESC, lidx, OS(BENCH_IOS))
+				put(OID_LLDP_DEVADDR, lidx + '.1.4.' + self.ip(peer), rfc1902.ObjectIdentifier('1.3.6.1.4.1.9'))
+
+		# a few access ports
+		first = BENCH_IF_DOWNLINK + self.fanout * 2
+		for port in xrange(first, first + BENCH_IF_ACCESS):
+			add_if(port, 'Gi1/0/%i' % port)
+			put(OID_TRUNK_VTP, port, I(2))
+			put(OID_IF_VLAN, port, I(10))
+			put(OID_LAG_LACP, port, I(0))
+
+		return d
+
+
+#
+# Crawl a synthetic network of this many devices and time it.
+# Outputs are written to out_dir, or a temporary directory.
+#
+# If churn is given, a snapshot of the crawl is saved and the network
+# crawled again incrementally after churn percent of it changed.
+#
+# Returns a dict of the measurements.  peak_mem is the peak of the
+# whole process, see run_bench_process().
+#
+def run_bench(devices, workers = 1, fanout = 4, latency = 0, loss = 0, out_dir = None, churn = None):
+	topo = mnet_bench_topology(devices, fanout)
+	engine = mnet_snmp_replay_engine(topo, latency, loss, seed = devices)
+	prev_engine = set_snmp_engine(engine)
+
+	try:
+		return _run_bench(topo, engine, devices, workers, out_dir, churn)
+	finally:
+		set_snmp_engine(prev_engine)
+
+
+def _run_bench(topo, engine, devices, workers, out_dir, churn):
+	if (out_dir == None):
+		out_dir = tempfile.mkdtemp(prefix = 'mnet-bench-')
+	elif (os.path.isdir(out_dir) == False):
+		os.makedirs(out_dir)
+
+	graph = _bench_graph(devices, workers)
+
+	ret = {'devices': devices, 'workers': workers}
+
+	stdout = sys.stdout
+	sys.stdout = open(os.devnull, 'w')
+	try:
+		t = time.time()
+		graph.crawl(topo.ip(0))
+		ret['crawl'] = time.time() - t
+		ret['crawl_requests'] = engine.requests
+
+		t = time.time()
+		graph.output_stdout()
+		ret['stdout'] = time.time() - t
+
+		t = time.time()
+		graph.output_dot(os.path.join(out_dir, 'bench-%i.raw' % devices), 'MNet Benchmark')
+		ret['dot'] = time.time() - t
+
+		t = time.time()
+		graph.output_catalog(os.path.join(out_dir, 'bench-%i.csv' % devices))
+		ret['catalog'] = time.time() - t
+		ret['requests'] = engine.requests
+
+		ret['errors'] = check_bench(graph, topo)
+
+		if (churn != None):
+			snap = os.path.join(out_dir, 'bench-%i.snap' % devices)
+			graph.save_snapshot(snap)
+			topo.set_epoch(1, churn)
+
+			regraph = _bench_graph(devices, workers)
+			regraph.load_previous(snap)
+
+			t = time.time()
+			regraph.crawl(topo.ip(0))
+			ret['recrawl'] = time.time() - t
+			ret['recrawl_requests'] = engine.requests - ret['requests']
+			ret['reused'] = regraph.get_reused_count()
+	finally:
+		sys.stdout.close()
+		sys.stdout = stdout
+
+	ret['nodes'] = len(graph.nodes)
+	ret['total'] = ret['crawl'] + ret['stdout'] + ret['dot'] + ret['catalog']
+
+	# peak of the whole process, in kB on Linux
+	ret['peak_mem'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+	return ret
+
+
+#
+# run_bench() in a process of its own, so the peak memory
+# is that of this network size and not of the ones before it.
+#
+def run_bench_process(devices, workers = 1, fanout = 4, latency = 0, loss = 0, out_dir = None, churn = None):
+	pool = multiprocessing.Pool(1)
+	try:
+		return pool.apply(run_bench, (devices, workers, fanout, latency, loss, out_dir, churn))
+	finally:
+		pool.close()
+		pool.join()
+
+
+#
+# Compare what the crawl found against the synthetic network.
+# Returns a list of the differences, empty if there are none.
+#
+def check_bench(graph, topo):
+	errors = []
+
+	for node in graph.nodes:
+		i = topo.device(node.ip[0])
+		if (i == None):
+			errors.append('%s: %s is not a bench device' % (node.name, node.ip[0]))
+			continue
+
+		want = [(str(num), serial, plat) for (num, serial, plat) in topo.stack_members(i)]
+		got = [(m.num, m.serial, m.plat) for m in node.stack.members]
+		if (got != want):
+			errors.append('%s: stack members %s, expected %s' % (node.name, got, want))
+
+		want = topo.vss_members(i)
+		got = []
+		if (node.vss.enabled != 0):
+			got = [(m.ios, m.serial, m.plat) for m in node.vss.members]
+		if (got != want):
+			errors.append('%s: VSS members %s, expected %s' % (node.name, got, want))
+
+	return errors
+
+
+def _bench_graph(devices, workers):
+	graph = mnet_graph()
+	graph.config.snmp_creds = [{'ver': 2, 'community': BENCH_COMMUNITY}]
+	graph.config.host_domains = [BENCH_DOMAIN]
+	graph.config.allowed_subnets = ['10.0.0.0/8']
+	graph.config.graph.get_stack_members = True
+	graph.config.graph.get_vss_members = True
+	graph.set_workers(workers)
+	graph.set_catalog(True)
+
+	# deep enough to reach every device
+	graph.set_max_depth(devices)
+
+	return graph
+
+
+def print_bench_header():
+	print('%8s %7s %8s %9s %8s %8s %8s %9s %9s %9s %10s %9s %9s %7s' % (
+			'devices', 'nodes', 'workers', 'crawl s', 'stdout s', 'dot s', 'csv s',
+			'total s', 'requests', 'peak MB', 'ms/device',
+			'recrawl s', 'requests', 'reused'))
+
+def print_bench(r):
+	recrawl = '%9s %9s %7s' % ('-', '-', '-')
+	if ('recrawl' in r):
+		recrawl = '%9.2f %9i %7i' % (r['recrawl'], r['recrawl_requests'], r['reused'])
+
+	print('%8i %7i %8i %9.2f %8.2f %8.2f %8.2f %9.2f %9i %9.1f %10.2f %s' % (
+			r['devices'], r['nodes'], r['workers'],
+			r['crawl'], r['stdout'], r['dot'], r['catalog'], r['total'],
+			r['requests'], r['peak_mem'] / 1024.0,
+			r['total'] * 1000.0 / r['devices'],
+			recrawl))
@@ -0,0 +1,199 @@
+#!/usr/bin/python
+
+'''
+	MNet Suite
+	cache.py
+
+	Michael Laforest
+	mjlaforest@gmail.com
+
+	Copyright (C) 2015 Michael Laforest
+
+	This program is free software; you can redistribute it and/or
+	modify it under the terms of the GNU General Public License
+	as published by the Free Software Foundation; either version 2
+	of the License, or (at your option) any later version.
+
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License
+	along with this program; if not, write to the Free Software
+	Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+'''
+
+import os
+import json
+import time
+import threading
+
+# seconds an unreachable host is skipped for
+UNREACHABLE_TTL = 600
+
+class mnet_file_cache:
+	'''
+	Base for the small caches kept between runs.
+	Subclasses fill in _from_json() and _to_json().
+
+	Without a filename the cache only lives for this run.
+	Files are written readable by the owner only.
+
+	Changes are only kept in memory until save(), which
+	the caller does once at the end of a crawl or trace.
+	'''
+	filename = None
+
+	def __init__(self, filename = None):
+		self.filename = filename
+		self._lock = threading.Lock()
+		self._dirty = False
+		self._from_json({})
+
+		if (filename):
+			self.load()
+
+	def load(self):
+		try:
+			json_data = json.loads(open(self.filename).read())
+		except:
+			# no cache yet or unreadable, start over
+			json_data = {}
+
+		with self._lock:
+			self._from_json(json_data)
+			self._dirty = False
+
+	#
+	# Write the file if anything changed since it was read.
+	#
+	def save(self):
+		if (self.filename == None):
+			return
+
+		with self._lock:
+			if (self._dirty == False):
+				return
+			self._dirty = False
+			data = json.dumps(self._to_json(), indent = 1, sort_keys = True)
+
+			# write a new file and move it over the old one
+			tmp = self.filename + '.tmp'
+			try:
+				fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0600)
+				try:
+					os.fchmod(fd, 0600)
+					os.write(fd, data)
+				finally:
+					os.close(fd)
+				os.rename(tmp, self.filename)
+			except (IOError, OSError) as e:
+				print('[E] Unable to write cache %s: %s' % (self.filename, e))
+
+	def _from_json(self, json_data):
+		pass
+
+	def _to_json(self):
+		return {}
+
+
+class mnet_cred_cache(mnet_file_cache):
+	'''
+	SNMP community that worked last time, by IP and by /24.
+
+	Only the community string is kept, and only used again if it
+	is still one of the configured credentials.
+	'''
+	def _from_json(self, json_data):
+		self._ips = json_data.get('ip', {})
+		self._subnets = json_data.get('subnet', {})
+
+	def _to_json(self):
+		return {'ip': self._ips, 'subnet': self._subnets}
+
+	#
+	# Credential to try first for this IP, from snmp_creds.
+	# Falls back to the one used in the same /24 unless subnet is False.
+	# Returns None if nothing usable is cached.
+	#
+	def lookup(self, ip, snmp_creds, subnet = True):
+		with self._lock:
+			community = self._ips.get(ip)
+			if ((community == None) & subnet):
+				community = self._subnets.get(self._subnet(ip))
+
+		if (community == None):
+			return None
+
+		for cred in snmp_creds:
+			if ((cred['ver'] == 2) & (cred['community'] == community)):
+				return cred
+
+		return None
+
+	#
+	# Remember the credential that worked for this IP.
+	#
+	def store(self, ip, cred):
+		community = cred['community']
+		subnet = self._subnet(ip)
+
+		with self._lock:
+			if ((self._ips.get(ip) == community) & (self._subnets.get(subnet) == community)):
+				return
+			self._ips[ip] = community
+			self._subnets[subnet] = community
+			self._dirty = True
+
+	def _subnet(self, ip):
+		return '.'.join(ip.split('.')[:3]) + '.0/24'
+
+
+class mnet_unreachable_cache(mnet_file_cache):
+	'''
+	Hosts that did not answer SNMP with any credential.
+	They are skipped until their entry is ttl seconds old.
+	'''
+	ttl = UNREACHABLE_TTL
+
+	def __init__(self, filename = None, ttl = UNREACHABLE_TTL):
+		self.ttl = ttl
+		mnet_file_cache.__init__(self, filename)
+
+	def _from_json(self, json_data):
+		# IP -> time it was found unreachable
+		self._hosts = json_data.get('unreachable', {})
+		self._purge()
+
+	def _to_json(self):
+		self._purge()
+		return {'unreachable': self._hosts}
+
+	#
+	# Drop the entries that are ttl seconds old.  Only done when
+	# the file is read or written, is_unreachable() skips them
+	# in between.
+	#
+	def _purge(self):
+		now = time.time()
+		self._hosts = dict([(h, t) for h, t in self._hosts.items() if (now - t < self.ttl)])
+
+	#
+	# Returns 1 if this IP failed less than ttl seconds ago.
+	#
+	def is_unreachable(self, ip):
+		with self._lock:
+			t = self._hosts.get(ip)
+			if (t == None):
+				return 0
+			if (time.time() - t < self.ttl):
+				return 1
+			del self._hosts[ip]
+			self._dirty = True
+		return 0
+
+	def add(self, ip):
+		with self._lock:
+			self._hosts[ip] = time.time()
+			self._dirty = True
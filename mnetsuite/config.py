@@ -38,6 +38,16 @@ class mnet_config_graph:
 	expand_stackwise = False
 	expand_vss = False
 	expand_lag = True
+	traversal = 'dfs'
+	chassis_workers = 4
+	partition = None
+	partition_prefix = 24
+	partition_depth = 2
+
+class mnet_config_cache:
+	credentials = None
+	unreachable = None
+	unreachable_ttl = 600
 
 class mnet_config:
 	host_domains	= []
@@ -45,6 +55,7 @@ class mnet_config:
 	exclude_subnets	= []
 	allowed_subnets	= []
 	graph = None
+	cache = None
 
 	def __init__(self):
 		self.host_domains		= []
@@ -52,6 +63,7 @@ class mnet_config:
 		self.exclude_subnets	= []
 		self.allowed_subnets	= []
 		self.graph				= mnet_config_graph()
+		self.cache				= mnet_config_cache()
 
 	def load(self, filename):
 		# load config
@@ -77,6 +89,17 @@ class mnet_config:
 			self.graph.expand_stackwise   = json_graph.get('expand_stackwise', False)
 			self.graph.expand_vss         = json_graph.get('expand_vss', False)
 			self.graph.expand_lag         = json_graph.get('expand_lag', True)
+			self.graph.traversal          = json_graph.get('traversal', 'dfs')
+			self.graph.chassis_workers    = json_graph.get('chassis_workers', 4)
+			self.graph.partition          = json_graph.get('partition', None)
+			self.graph.partition_prefix   = json_graph.get('partition_prefix', 24)
+			self.graph.partition_depth    = json_graph.get('partition_depth', 2)
+
+		json_cache = json_data.get('cache', None)
+		if (json_cache != None):
+			self.cache.credentials        = json_cache.get('credentials', None)
+			self.cache.unreachable        = json_cache.get('unreachable', None)
+			self.cache.unreachable_ttl    = json_cache.get('unreachable_ttl', 600)
 
 		return 1
 
@@ -120,7 +143,17 @@ class mnet_config:
 				'		"get_vss_members" : 0,\n' \
 				'		"expand_stackwise" : 0,\n' \
 				'		"expand_vss" : 0,\n' \
-				'		"expand_lag" : 1\n' \
+				'		"expand_lag" : 1,\n' \
+				'		"traversal" : "dfs",\n' \
+				'		"chassis_workers" : 4,\n' \
+				'		"partition" : null,\n' \
+				'		"partition_prefix" : 24,\n' \
+				'		"partition_depth" : 2\n' \
+				'	},\n' \
+				'	"cache" : {\n' \
+				'		"credentials" : "mnet-creds.cache",\n' \
+				'		"unreachable" : "mnet-unreachable.cache",\n' \
+				'		"unreachable_ttl" : 600\n' \
 				'	}\n' \
 				'}'
 
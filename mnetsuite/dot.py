@@ -0,0 +1,175 @@
+#!/usr/bin/python
+
+'''
+	MNet Suite
+	dot.py
+
+	Michael Laforest
+	mjlaforest@gmail.com
+
+	Copyright (C) 2015 Michael Laforest
+
+	This program is free software; you can redistribute it and/or
+	modify it under the terms of the GNU General Public License
+	as published by the Free Software Foundation; either version 2
+	of the License, or (at your option) any later version.
+
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License
+	along with this program; if not, write to the Free Software
+	Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+'''
+
+import re
+import subprocess
+
+# graphviz program used to render anything other than raw DOT
+DOT_PROG = 'dot'
+
+# formats written as DOT text without running graphviz
+DOT_RAW_FORMATS = ['raw']
+
+DOT_KEYWORDS = ['graph', 'subgraph', 'digraph', 'node', 'edge', 'strict']
+
+_id_plain = re.compile('^([_a-zA-Z][_a-zA-Z0-9]*|-?(\.[0-9]+|[0-9]+(\.[0-9]*)?))$')
+_id_html = re.compile('^<.*>$', re.S)
+
+
+#
+# Quote a DOT ID or attribute value unless it can be used as is.
+# Plain names, numbers and HTML labels are left alone, the same
+# as pydot did, so existing graphs come out unchanged.
+#
+def dot_quote(s):
+	if (isinstance(s, basestring) == False):
+		return str(s)
+
+	if ((_id_plain.match(s) != None) & (s.lower() not in DOT_KEYWORDS)):
+		return s
+	if (_id_html.match(s) != None):
+		return s
+
+	s = s.replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
+	return '"' + s + '"'
+
+
+def _dot_attrs(attrs):
+	return ', '.join(['%s=%s' % (a, dot_quote(attrs[a])) for a in sorted(attrs)])
+
+
+class mnet_dot_writer:
+	'''
+	Writes a graph in the DOT language as it is built,
+	without keeping the nodes and edges in memory.
+
+	Raw DOT is written straight to the file, any other
+	format is piped through graphviz as it is written.
+	'''
+	filename = None
+	fmt = None
+
+	def __init__(self, filename, fmt):
+		self.filename = filename
+		self.fmt = fmt
+		self._f = None
+		self._proc = None
+		self._error = None
+
+	#
+	# Start the output and write the graph attributes.
+	# Returns 1 on success.
+	#
+	def open(self, graph_type = 'graph', name = 'G', **attrs):
+		try:
+			if (self.fmt in DOT_RAW_FORMATS):
+				self._f = open(self.filename, 'w')
+			else:
+				self._proc = subprocess.Popen(
+							[DOT_PROG, '-T%s' % self.fmt, '-o', self.filename],
+							stdin = subprocess.PIPE
+						)
+				self._f = self._proc.stdin
+		except (IOError, OSError) as e:
+			print('Error: Unable to write %s: %s' % (self.filename, e))
+			return 0
+
+		self._write('%s %s {\n' % (graph_type, name))
+		for a in sorted(attrs):
+			self._write('%s=%s;\n' % (a, dot_quote(attrs[a])))
+
+		return 1
+
+	def set_node_defaults(self, **attrs):
+		self._write('node [%s];\n' % _dot_attrs(attrs))
+
+	def set_edge_defaults(self, **attrs):
+		self._write('edge [%s];\n' % _dot_attrs(attrs))
+
+	def add_node(self, name, **attrs):
+		self._write('%s [%s];\n' % (dot_quote(name), _dot_attrs(attrs)))
+
+	def add_edge(self, src, dst, **attrs):
+		self._write('%s -- %s  [%s];\n' % (dot_quote(src), dot_quote(dst), _dot_attrs(attrs)))
+
+	#
+	# Nodes added until end_cluster() are drawn grouped together.
+	#
+	def start_cluster(self, name, **attrs):
+		self._write('subgraph %s {\n' % dot_quote('cluster_' + name))
+		for a in sorted(attrs):
+			self._write('%s=%s;\n' % (a, dot_quote(attrs[a])))
+
+	def end_cluster(self):
+		self._write('}\n\n')
+
+	#
+	# Finish the graph and wait for graphviz.
+	# Returns 1 on success.
+	#
+	def close(self):
+		self.end()
+		return self.wait()
+
+	#
+	# Finish the graph without waiting, so graphviz
+	# can lay it out while the next one is written.
+	#
+	def end(self):
+		self._write('}\n')
+		try:
+			self._f.close()
+		except (IOError, OSError) as e:
+			if (self._error == None):
+				self._error = e
+
+	#
+	# Wait for graphviz after end().
+	# Returns 1 on success.
+	#
+	def wait(self):
+		if (self._proc != None):
+			if (self._proc.wait() != 0):
+				print('Error: graphviz could not create %s.' % self.filename)
+				return 0
+
+		if (self._error != None):
+			print('Error: Unable to write %s: %s' % (self.filename, self._error))
+			return 0
+
+		return 1
+
+	#
+	# Write errors are kept for close(), so a graphviz that
+	# exited early doesn't stop the caller half way.
+	#
+	def _write(self, s):
+		if (self._error != None):
+			return
+		try:
+			self._f.write(s)
+		except (IOError, OSError) as e:
+			self._error = e
@@ -25,18 +25,29 @@
 '''
 
 import sys
+import re
 import getopt
-import pydot
 import datetime
 import os
 import binascii
+import copy
+import threading
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+from collections import deque
 
 from snmp import *
 from config import mnet_config
+from cache import mnet_cred_cache, mnet_unreachable_cache
+import snapshot
+from dot import mnet_dot_writer
 from util import *
 from node import *
 from _version import __version__
 
+# ways output_partitions() can split the network
+PARTITION_MODES = ['subnet', 'depth', 'core']
+
 
 class mnet_graph_dot_node:
 	ntype = None
@@ -59,18 +70,100 @@ class mnet_graph:
 
 	nodes = []
 	max_depth = 0
+	workers = 1
+	catalog = False
 	config = None
+	cred_cache = None
+	dead_cache = None
 
 	def __init__(self):
 		self.config = mnet_config()
+		self.cred_cache = mnet_cred_cache()
+		self.dead_cache = mnet_unreachable_cache()
+		self.nodes = []
+		self.workers = 1
+		self.catalog = False
+
+		# IP -> node and name -> [nodes] in the order of self.nodes,
+		# kept in step by _add_node(), _add_node_ip() and _set_node_name()
+		self._nodes_by_ip = {}
+		self._nodes_by_name = {}
+		self._node_order = {}
+
+		# (node, peer node, local port) -> first link added for it
+		self._links_by_port = {}
+
+		# read-ahead of the concurrent crawl, see _crawl_concurrent():
+		# neighbor reads by node and probes of new nodes by IP
+		self._pool = None
+		self._fetches = {}
+		self._probes = {}
+		self._probe_lock = threading.Lock()
+
+		# background chassis info walks while crawling, see crawl()
+		self._chassis_pool = None
+		self._chassis_fetch = {}
+
+		# nodes of the previous crawl by IP, see load_previous(),
+		# and the nodes of this crawl that reuse them
+		self._previous = {}
+		self._previous_options = None
+		self._reused = {}
+
+		# compiled config subnets, see _compile_subnets()
+		self._exclude_filter = None
+		self._allowed_filter = None
 
 	def load_config(self, config_file):
 		if (config_file):
 			self.config.load(config_file)
+			self.cred_cache = mnet_cred_cache(self.config.cache.credentials)
+			self.dead_cache = mnet_unreachable_cache(self.config.cache.unreachable,
+					self.config.cache.unreachable_ttl)
+			self._compile_subnets()
 
 	def set_max_depth(self, depth):
 		self.max_depth = depth
 
+	#
+	# Number of devices to talk to at the same time while crawling.
+	# 1 keeps the original serial crawl.
+	#
+	def set_workers(self, workers):
+		self.workers = max(1, workers)
+
+
+	#
+	# Visit the nodes reachable from root without recursing, depth-first
+	# or breadth-first per the graph traversal option.
+	# visit(node, depth) returns the nodes to visit next, in order.
+	#
+	def _traverse(self, root, visit):
+		pending = deque([(root, 0)])
+
+		while (len(pending) > 0):
+			if (self.config.graph.traversal == 'bfs'):
+				node, depth = pending.popleft()
+				pending.extend([(n, depth+1) for n in visit(node, depth)])
+			else:
+				node, depth = pending.pop()
+				pending.extend(reversed([(n, depth+1) for n in visit(node, depth)]))
+
+
+	#
+	# Gather the fields output_catalog() needs while crawling
+	# instead of querying every node again afterwards.
+	#
+	def set_catalog(self, catalog):
+		self.catalog = catalog
+
+
+	#
+	# Split output_dot() into partitions, one of PARTITION_MODES.
+	#
+	def set_partition(self, mode):
+		self.config.graph.partition = mode
+
 
 	def _reset_crawled(self):
 		for n in self.nodes:
@@ -78,22 +171,87 @@ class mnet_graph:
 
 
 	def crawl(self, ip):
-		# pull info for this node
-		node = self._get_node(ip, 0, 'root')
-		if (node != None):
-			self._crawl_node(node, 0)
-		
-		self.root_node = node
+		self._compile_subnets()
+		self._reused = {}
 
-		# we may have missed chassis info
-		for n in self.nodes:
-			if ((n.serial == None) | (n.plat == None) | (n.ios == None)):
-				n.opts.get_chassis_info = True
-				n.query_node()
+		# chassis info is walked in the background as nodes are found
+		self._chassis_pool = ThreadPool(max(1, self.config.graph.chassis_workers))
+		self._chassis_fetch = {}
+
+		try:
+			# pull info for this node
+			node = self._get_node(ip, 0, 'root')
+			if (node != None):
+				if (self.workers > 1):
+					self._crawl_concurrent(node)
+				else:
+					self._traverse(node, self._crawl_node)
+			
+			self.root_node = node
+
+			# the previous crawl already filled in chassis info
+			for n, prev in self._reused.items():
+				n.serial = prev.serial
+				n.plat = prev.plat
+				n.ios = prev.ios
+
+			# we may have missed chassis info
+			missing = []
+			for n in self.nodes:
+				if ((n.serial == None) | (n.plat == None) | (n.ios == None)):
+					missing.append(n)
+			self._chassis_pool.map(self._get_chassis_info, missing)
+
+			# nodes that weren't crawled may still hold tables,
+			# so may the prefetched chassis walks nobody needed
+			for n in self.nodes:
+				fetch = self._chassis_fetch.pop(n, None)
+				if (fetch != None):
+					fetch.wait()
+					n.chassis_vbtbl = None
+				n.release_tables()
+		finally:
+			self._chassis_pool.close()
+			self._chassis_pool.join()
+			self._chassis_pool = None
+			self._chassis_fetch = {}
+
+			# write what was learned about the hosts, once
+			self.cred_cache.save()
+			self.dead_cache.save()
 
 		return
 
 
+	#
+	# Start walking the chassis info of a new node in the background.
+	# Most nodes need it after the crawl since CDP and LLDP don't
+	# advertise serial numbers.
+	#
+	def _prefetch_chassis_info(self, node):
+		if (self._chassis_pool == None):
+			return
+		if ((node.snmpobj.success == 0) | (node.serial != None)):
+			return
+		if ((node.stack.count > 0) | (node.vss.enabled != 0)):
+			return
+
+		self._chassis_fetch[node] = self._chassis_pool.apply_async(node.fetch_chassis_info)
+
+
+	#
+	# Fill in chassis info after the crawl, using the prefetched
+	# walk if there was one.
+	#
+	def _get_chassis_info(self, node):
+		fetch = self._chassis_fetch.pop(node, None)
+		if (fetch != None):
+			fetch.wait()
+
+		node.opts.get_chassis_info = True
+		node.query_node()
+
+
 	def _print_step(self, ip, name, indicator, depth, discovered_proto, can_connect):
 		if (discovered_proto == 'cdp'):
 			sys.stdout.write('[ cdp]')
@@ -113,47 +271,133 @@ class mnet_graph:
 			print('UNKNOWN (%s)            << UNABLE TO CONNECT WITH SNMP' % ip)
 
 
-	def _get_node(self, ip, depth, discovered_proto):
+	#
+	# Create a node for this IP and find its credentials and name.
+	# Safe to call from worker threads; it does not touch self.nodes.
+	#
+	def _probe_node(self, ip):
 		node = mnet_node()
 		node.name = 'UNKNOWN'
 		node.ip = [ip]
 
+		if (node.try_snmp_creds(self.config.snmp_creds, self.cred_cache, self.dead_cache) == 1):
+			node.name = node._get_system_name(self.config.host_domains)
+			if (ip in self._previous):
+				node.get_markers()
+
+		return node
+
+
+	def _find_node_by_ip(self, ip):
+		return self._nodes_by_ip.get(ip)
+
+
+	#
+	# First node in self.nodes with this name, or None.
+	#
+	def _find_node_by_name(self, name):
+		nodes = self._nodes_by_name.get(name)
+		if (nodes):
+			return nodes[0]
+		return None
+
+
+	def _add_node(self, node):
+		self._node_order[node] = len(self.nodes)
+		self.nodes.append(node)
+
+		for ip in node.ip:
+			self._nodes_by_ip.setdefault(ip, node)
+		self._index_node_name(node)
+
+
+	def _add_node_ip(self, node, ip):
+		node.ip.append(ip)
+		self._nodes_by_ip.setdefault(ip, node)
+
+
+	def _set_node_name(self, node, name):
+		if (node in self._node_order):
+			nodes = self._nodes_by_name.get(node.name)
+			if (nodes != None):
+				nodes.remove(node)
+			node.name = name
+			self._index_node_name(node)
+		else:
+			node.name = name
+
+
+	def _index_node_name(self, node):
+		nodes = self._nodes_by_name.setdefault(node.name, [])
+		nodes.append(node)
+		if ((len(nodes) > 1) and (self._node_order[nodes[-2]] > self._node_order[node])):
+			nodes.sort(key = self._node_order.get)
+
+
+	def _get_node(self, ip, depth, discovered_proto):
 		# vmware ESX reports the IP as 0.0.0.0
 		# return a minimal node since we don't have
 		# a real IP.
 		# LLDP can return an empty string for IPs.
 		if ((ip == '0.0.0.0') | (ip == '')):
-			self.nodes.append(node)
+			node = mnet_node()
+			node.name = 'UNKNOWN'
+			node.ip = [ip]
+			self._add_node(node)
 			return node
 
 		# see if we know about this node by its IP first.
 		# this would save us an SNMP query for the hostname.
-		for ex in self.nodes:
-			for exip in ex.ip:
-				if (exip == ip):
-					return ex
+		ex = self._find_node_by_ip(ip)
+		if (ex != None):
+			return ex
+
+		# find valid credentials for this node,
+		# unless the concurrent crawl already did
+		with self._probe_lock:
+			probe = self._probes.pop(ip, None)
+		if (probe != None):
+			node, queried = probe.get()
+		else:
+			node = self._probe_node(ip)
+			queried = False
 
-		# find valid credentials for this node
-		if (node.try_snmp_creds(self.config.snmp_creds) == 0):
+		if (node.snmpobj.success == 0):
 			self._print_step(ip, None, '+', depth, discovered_proto, 0)
-			self.nodes.append(node)
+			self._add_node(node)
 			return node
 
-		node.name = node._get_system_name(self.config.host_domains)
-
 		# verify this node isn't already in our visited
 		# list by checking for its hostname
-		for ex in self.nodes:
-			if (ex.name == node.name):
-				for exip in ex.ip:
-					if (exip == ip):
-						return ex
-				ex.ip.append(ip)
-				return ex
+		ex = self._find_node_by_name(node.name)
+		if (ex != None):
+			if (ip not in ex.ip):
+				self._add_node_ip(ex, ip)
+			return ex
 
 		# print some info to stdout
 		self._print_step(ip, node.name, '+', depth, discovered_proto, 1)
 
+		# nothing changed since the previous crawl
+		prev = self._previous.get(ip)
+		if (self._can_reuse_node(node, prev) == 1):
+			self._reuse_node(node, prev)
+			self._add_node(node)
+			return node
+
+		if (queried == False):
+			self._query_node(node)
+		self._prefetch_chassis_info(node)
+		self._add_node(node)
+
+		return node
+
+
+	#
+	# Query everything the graph needs from a new node.
+	#
+	def _query_node(self, node):
+		node.opts.get_markers = (node.sys_uptime == None)
 		node.opts.get_router = True
 		node.opts.get_ospf_id = True
 		node.opts.get_bgp_las = True
@@ -166,46 +410,47 @@ class mnet_graph:
 		node.opts.get_vss_details = self.config.graph.get_vss_members
 		node.opts.get_svi = self.config.graph.include_svi
 		node.opts.get_lo = self.config.graph.include_lo
+		node.opts.get_bootf = self.catalog
 
 		node.query_node()
-		self.nodes.append(node)
-
-		return node
 
 
 	#
-	# Crawl device at this IP.
-	# Recurse down a level if 'depth' > 0
+	# Mark the node as crawled.
+	# Returns 1 if its neighbors should be pulled.
 	#
-	def _crawl_node(self, node, depth):
+	def _start_crawl(self, node, depth):
 		if (node == None):
-			return
+			return 0
 
 		if (depth >= self.max_depth):
-			return
+			return 0
 					
 		if (node.crawled > 0):
-			return
+			return 0
 		node.crawled = 1
 
 		# vmware ESX can report IP as 0.0.0.0
 		# If we are allowing 0.0.0.0/32 in the config,
 		# then we added it as a leaf, but don't crawl it
 		if (node.ip[0] == '0.0.0.0'):
-			return
+			return 0
 
 		# may be a leaf we couldn't connect to previously
 		if (node.snmpobj.success == 0):
-			return
+			return 0
 
-		# print some info to stdout
-		self._print_step(node.ip[0], node.name, '>', depth, '', 1)
+		return 1
 
-		# get the cached snmp credentials
-		snmpobj = node.snmpobj
 
-		# list of valid neighbors to crawl next
-		valid_neighbors = []
+	#
+	# Get the CDP and LLDP neighbors of a node.
+	# Returns None if neither could be read.
+	#
+	def _get_neighbors(self, node):
+		# reuse the ones from the previous crawl
+		if (node in self._reused):
+			return [copy.copy(n) for n in node.neighbors]
 
 		# get list of CDP neighbors
 		cdp_neighbors = node.get_cdp_neighbors()
@@ -213,14 +458,32 @@ class mnet_graph:
 		# get list of LLDP neighbors
 		lldp_neighbors = node.get_lldp_neighbors()
 
+		# the tables behind them aren't needed anymore
+		node.release_tables()
+
 		if ((cdp_neighbors == None) & (lldp_neighbors == None)):
-			return
+			return None
+
+		neighbors = (cdp_neighbors or []) + (lldp_neighbors or [])
 
-		neighbors = cdp_neighbors + lldp_neighbors
+		# keep them as read for the next incremental crawl,
+		# linking changes the ones returned
+		node.neighbors = [copy.copy(n) for n in neighbors]
 
-		for n in neighbors:
+		return neighbors
+
+
+	#
+	# Resolve and link the neighbors of a crawled node.
+	# Returns the list of child nodes to crawl next.
+	#
+	def _link_neighbors(self, node, neighbors, depth):
+		valid_neighbors = []
+		allowed = self.are_nodes_allowed([n.remote_ip for n in neighbors])
+
+		for n, n_allowed in zip(neighbors, allowed):
 			# if the remote IP is not allowed, stop processing it here
-			if (self.is_node_allowed(n.remote_ip) == 0):
+			if (n_allowed == 0):
 				continue
 
 			# get the child info
@@ -229,7 +492,7 @@ class mnet_graph:
 				if (child != None):
 					# if we couldn't pull info from SNMP fill in what we know
 					if (child.snmpobj.success == 0):
-						child.name = shorten_host_name(n.remote_name, self.config.host_domains)
+						self._set_node_name(child, shorten_host_name(n.remote_name, self.config.host_domains))
 						self._print_step(n.remote_ip, n.remote_name, '+', depth, n.discovered_proto, 1)
 
 					# CDP/LLDP advertises the platform
@@ -241,9 +504,113 @@ class mnet_graph:
 					if (self.add_link(node, n) == 1):
 						valid_neighbors.append(child)
 
-		# crawl the valid neighbors
-		for n in valid_neighbors:
-			self._crawl_node(n, depth+1)
+		return valid_neighbors
+
+
+	#
+	# Crawl device at this IP.
+	# Returns the neighbors to crawl at 'depth'+1.
+	#
+	def _crawl_node(self, node, depth):
+		if (self._start_crawl(node, depth) == 0):
+			return []
+
+		# print some info to stdout
+		self._print_step(node.ip[0], node.name, '>', depth, '', 1)
+
+		fetch = self._fetches.pop(node, None)
+		if (fetch != None):
+			neighbors = fetch.get()
+		else:
+			neighbors = self._get_neighbors(node)
+		if (neighbors == None):
+			return []
+
+		children = self._link_neighbors(node, neighbors, depth)
+		for child in children:
+			self._read_ahead(child, depth+1)
+
+		return children
+
+
+	#
+	# Crawl in the same order as the serial crawl while reading
+	# ahead from up to self.workers devices at once.
+	#
+	# The neighbor tables of the nodes waiting to be crawled are read
+	# in the worker pool, and so are the credentials and queries of
+	# the new neighbors they list.  Dedup and linking stay in this
+	# thread in traversal order, so the result is the same as with
+	# one worker whichever device answers first.
+	#
+	def _crawl_concurrent(self, root):
+		self._pool = ThreadPool(self.workers)
+
+		try:
+			self._read_ahead(root, 0)
+			self._traverse(root, self._crawl_node)
+		finally:
+			# reads still going may start probes, let them finish
+			for fetch in self._fetches.values():
+				fetch.wait()
+			self._pool.close()
+			self._pool.join()
+			self._pool = None
+			self._fetches = {}
+			self._probes = {}
+
+
+	#
+	# Start reading the neighbors of a node the crawl will get to,
+	# when crawling with workers.
+	#
+	def _read_ahead(self, node, depth):
+		if ((self._pool == None) | (node in self._fetches)):
+			return
+		if ((depth >= self.max_depth) | (node.crawled > 0) | (node.snmpobj.success == 0)):
+			return
+
+		self._fetches[node] = self._pool.apply_async(self._read_neighbors, (node,))
+
+
+	#
+	# Worker side of _read_ahead().  Reads the neighbors of a node
+	# and starts probing the ones not known yet.
+	#
+	def _read_neighbors(self, node):
+		neighbors = self._get_neighbors(node)
+		if (neighbors == None):
+			return None
+
+		ips = [n.remote_ip for n in neighbors]
+		for ip, ip_allowed in zip(ips, self.are_nodes_allowed(ips)):
+			if ((ip_allowed == 0) | (ip == 'UNKNOWN') | (ip == '0.0.0.0') | (ip == '')):
+				continue
+			if (self._find_node_by_ip(ip) != None):
+				continue
+
+			with self._probe_lock:
+				if (ip not in self._probes):
+					self._probes[ip] = self._pool.apply_async(self._probe_ahead, (ip,))
+
+		return neighbors
+
+
+	#
+	# Worker side of a probe started by _read_neighbors().
+	# Returns the node and whether it was queried already.
+	#
+	def _probe_ahead(self, ip):
+		node = self._probe_node(ip)
+		if (node.snmpobj.success == 0):
+			return (node, False)
+
+		# _get_node() reuses it instead
+		if (self._can_reuse_node(node, self._previous.get(ip)) == 1):
+			return (node, False)
+
+		self._query_node(node)
+		return (node, True)
 
 
 	#
@@ -253,32 +620,50 @@ class mnet_graph:
 		if ((ip == 'UNKNOWN') | (ip == '')):
 			return 1
 
-		ipaddr = None
-		if (USE_NETADDR):
-			ipaddr = IPAddress(ip)
+		if (self._exclude_filter == None):
+			self._compile_subnets()
 
 		# check exclude nodes
-		for e in self.config.exclude_subnets:
-			if (USE_NETADDR):
-				if (ip in IPNetwork(e)):
-					return 0
-			else:
-				if (is_ipv4_in_cidr(ip, e)):
-					return 0
+		if (self._exclude_filter.contains(ip)):
+			return 0
 		
 		# check allowed subnets
-		if ((self.config.allowed_subnets == None) | (len(self.config.allowed_subnets) == 0)):
+		if (self._allowed_filter.count == 0):
 			return 1
 
-		for s in self.config.allowed_subnets:
-			if (USE_NETADDR):
-				if (ipaddr in IPNetwork(s)):
-					return 1
+		return self._allowed_filter.contains(ip)
+
+
+	#
+	# is_node_allowed() for a list of IPs.
+	# Returns a list of 1 or 0 in the same order.
+	#
+	def are_nodes_allowed(self, ips):
+		if (self._exclude_filter == None):
+			self._compile_subnets()
+
+		excluded = self._exclude_filter.contains_list(ips)
+		if (self._allowed_filter.count == 0):
+			allowed = [1] * len(ips)
+		else:
+			allowed = self._allowed_filter.contains_list(ips)
+
+		ret = []
+		for ip, e, a in zip(ips, excluded, allowed):
+			if ((ip == 'UNKNOWN') | (ip == '')):
+				ret.append(1)
 			else:
-				if (is_ipv4_in_cidr(ip, s)):
-					return 1
+				ret.append(a & (1 - e))
+		return ret
 
-		return 0
+
+	#
+	# Compile the exclude and allowed subnets of the config.
+	# Done again at the start of each crawl in case they were changed.
+	#
+	def _compile_subnets(self):
+		self._exclude_filter = mnet_subnet_filter(self.config.exclude_subnets or [])
+		self._allowed_filter = mnet_subnet_filter(self.config.allowed_subnets or [])
 
 
 	#
@@ -292,48 +677,159 @@ class mnet_graph:
 			# both nodes have been crawled,
 			# so try to update existing reverse link info
 			# instead of adding a new link
-			for n in self.nodes:
-				# find the child, which was the original parent
-				if (n.name == link.node.name):
-					# find the existing link
-					for ex_link in n.links:
-						if ((ex_link.node.name == node.name) & (ex_link.local_port == link.remote_port)):
-							if ((link.local_if_ip != 'UNKNOWN') & (ex_link.remote_if_ip == None)):
-								ex_link.remote_if_ip = link.local_if_ip
+			ex_link = self._links_by_port.get((link.node, node, link.remote_port))
+			if (ex_link != None):
+				if ((link.local_if_ip != 'UNKNOWN') & (ex_link.remote_if_ip == None)):
+					ex_link.remote_if_ip = link.local_if_ip
 
-							if ((link.local_lag != 'UNKNOWN') & (ex_link.remote_lag == None)):
-								ex_link.remote_lag = link.local_lag
+				if ((link.local_lag != 'UNKNOWN') & (ex_link.remote_lag == None)):
+					ex_link.remote_lag = link.local_lag
 
-							if ((len(link.local_lag_ips) == 0) & len(ex_link.remote_lag_ips)):
-								ex_link.remote_lag_ips = link.local_lag_ips
+				if ((len(link.local_lag_ips) == 0) & len(ex_link.remote_lag_ips)):
+					ex_link.remote_lag_ips = link.local_lag_ips
 
-							if ((link.local_native_vlan != None) & (ex_link.remote_native_vlan == None)):
-								ex_link.remote_native_vlan = link.local_native_vlan
+				if ((link.local_native_vlan != None) & (ex_link.remote_native_vlan == None)):
+					ex_link.remote_native_vlan = link.local_native_vlan
 
-							if ((link.local_allowed_vlans != None) & (ex_link.remote_allowed_vlans == None)):
-								ex_link.remote_allowed_vlans = link.local_allowed_vlans
+				if ((link.local_allowed_vlans != None) & (ex_link.remote_allowed_vlans == None)):
+					ex_link.remote_allowed_vlans = link.local_allowed_vlans
 
-							return 0
-		else:
-			for ex_link in node.links:
-				if ((ex_link.node.name == link.node.name) & (ex_link.local_port == link.local_port)):
-					# haven't crawled yet but somehow we have this link twice.
-					# maybe from different discovery processes?
-					return 0
+				return 0
+		elif ((node, link.node, link.local_port) in self._links_by_port):
+			# haven't crawled yet but somehow we have this link twice.
+			# maybe from different discovery processes?
+			return 0
 
 		node.add_link(link)
+		self._links_by_port.setdefault((node, link.node, link.local_port), link)
+		return 1
+
+
+	#
+	# Save the crawled topology so it can be output again
+	# with load_snapshot() instead of crawling.
+	# Returns 1 on success.
+	#
+	def save_snapshot(self, filename):
+		return snapshot.save_snapshot(filename, self.nodes, self.root_node, self._snapshot_options())
+
+
+	#
+	# Graph options that change what is queried from a node.
+	#
+	def _snapshot_options(self):
+		return {
+			'include_svi': self.config.graph.include_svi,
+			'include_lo': self.config.graph.include_lo,
+			'include_serials': self.config.graph.include_serials,
+			'get_stack_members': self.config.graph.get_stack_members,
+			'get_vss_members': self.config.graph.get_vss_members
+		}
+
+
+	#
+	# Crawl incrementally from a snapshot of a previous crawl.
+	# Devices whose sysUpTime and CDP/LLDP last change times show
+	# nothing changed keep the data of the snapshot instead of
+	# being walked again.
+	# Returns 1 on success.
+	#
+	def load_previous(self, filename):
+		ret = snapshot.load_snapshot(filename)
+		if (ret == None):
+			return 0
+
+		nodes, root, options = ret
+
+		self._previous = {}
+		self._previous_options = options
+		for node in nodes:
+			if (node.snmpobj.success == 1):
+				for ip in node.ip:
+					self._previous.setdefault(ip, node)
+
 		return 1
 
 
-	def _output_stdout(self, node):
+	#
+	# Number of nodes of the last crawl that reused the previous one.
+	#
+	def get_reused_count(self):
+		return len(self._reused)
+
+
+	#
+	# Returns 1 if node, just probed, can take the data of prev
+	# from the previous crawl.
+	#
+	def _can_reuse_node(self, node, prev):
+		if (prev == None):
+			return 0
+		if ((prev.name != node.name) | (prev.neighbors == None)):
+			return 0
+		if (self._previous_options != self._snapshot_options()):
+			return 0
+
+		return node.markers_unchanged(prev)
+
+
+	def _reuse_node(self, node, prev):
+		node.plat = prev.plat
+		node.ios = prev.ios
+		node.router = prev.router
+		node.ospf_id = prev.ospf_id
+		node.bgp_las = prev.bgp_las
+		node.hsrp_pri = prev.hsrp_pri
+		node.hsrp_vip = prev.hsrp_vip
+		node.serial = prev.serial
+		node.bootfile = prev.bootfile
+		node.svis = prev.svis
+		node.loopbacks = prev.loopbacks
+		node.stack = prev.stack
+		node.vss = prev.vss
+		node.neighbors = prev.neighbors
+
+		self._reused[node] = prev
+
+
+	#
+	# Replace the topology with one saved by save_snapshot().
+	# Returns 1 on success.
+	#
+	def load_snapshot(self, filename):
+		ret = snapshot.load_snapshot(filename)
+		if (ret == None):
+			return 0
+
+		nodes, root, options = ret
+
+		self.nodes = []
+		self._nodes_by_ip = {}
+		self._nodes_by_name = {}
+		self._node_order = {}
+		self._links_by_port = {}
+
+		for node in nodes:
+			self._add_node(node)
+			for link in node.links:
+				self._links_by_port.setdefault((node, link.node, link.local_port), link)
+
+		self.root_node = root
+		return 1
+
+
+	#
+	# Print one node and add it and its links to counts.
+	# Returns the nodes linked from it.
+	#
+	def _output_stdout(self, node, counts):
 		if (node == None):
-			return (0, 0)
+			return []
 		if (node.crawled > 0):
-			return (0, 0)
+			return []
 		node.crawled = 1
 
-		ret_nodes = 1
-		ret_links = 0
+		counts[0] += 1
 
 		print('-----------------------------------------')
 		print('      Name: %s' % node.name)
@@ -397,14 +893,9 @@ class mnet_graph:
 			if ((link.local_lag != None) | (link.remote_lag != None)):
 				lag = 'LAG[%s:%s]' % (link.local_lag or '', link.remote_lag or '')
 			print('       %s -> %s:%s %s' % (link.local_port, link.node.name, link.remote_port, lag))
-			ret_links += 1
-
-		for link in node.links:
-			rn, rl = self._output_stdout(link.node)
-			ret_nodes += rn
-			ret_links += rl
+			counts[1] += 1
 
-		return (ret_nodes, ret_links)
+		return [link.node for link in node.links]
 
 
 	def output_stdout(self):
@@ -413,7 +904,9 @@ class mnet_graph:
 		print('-----')
 		print('----- DEVICES')
 		print('-----')
-		num_nodes, num_links = self._output_stdout(self.root_node)
+		counts = [0, 0]
+		self._traverse(self.root_node, lambda node, depth: self._output_stdout(node, counts))
+		num_nodes, num_links = counts
 
 		print('Discovered devices: %i' % num_nodes)
 		print('Discovered links:   %i' % num_links)
@@ -496,34 +989,80 @@ class mnet_graph:
 		return dot_node
 
 
-	def _output_dot(self, graph, node):
+	#
+	# Add every node and link reachable from root to the graph.
+	#
+	# Depth-first, a link is added once the node at its far end has
+	# been written, as the recursive version did.  Breadth-first, a
+	# node's links are added right after the node.
+	#
+	def _output_dot(self, graph, root):
+		if (self.config.graph.traversal == 'bfs'):
+			pending = deque([root])
+			while (len(pending) > 0):
+				node = pending.popleft()
+				if (self._output_dot_node(graph, node) == 0):
+					continue
+
+				lags = []
+				for link in node.links:
+					pending.append(link.node)
+					self._output_dot_links(graph, node, link, lags)
+			return
+
+		# [node, next link, LAGs drawn, next link's node written]
+		frames = []
+		if (self._output_dot_node(graph, root) == 1):
+			frames.append([root, 0, [], 0])
+
+		while (len(frames) > 0):
+			frame = frames[-1]
+			node = frame[0]
+			if (frame[1] >= len(node.links)):
+				frames.pop()
+				continue
+
+			link = node.links[frame[1]]
+			if (frame[3] == 0):
+				frame[3] = 1
+				if (self._output_dot_node(graph, link.node) == 1):
+					frames.append([link.node, 0, [], 0])
+				continue
+
+			self._output_dot_links(graph, node, link, frame[2])
+			frame[1] += 1
+			frame[3] = 0
+
+
+	#
+	# Add a node to the graph.
+	# Returns 0 if it was already added.
+	#
+	def _output_dot_node(self, graph, node):
 		if (node == None):
-			return (0, 0)
+			return 0
 		if (node.crawled > 0):
-			return (0, 0)
+			return 0
 		node.crawled = 1
 
 		dot_node = self._output_dot_get_node(graph, node)
 
 		if (dot_node.ntype == 'single'):
 			graph.add_node(
-					pydot.Node(
-						name = node.name,
-						label = '<%s>' % dot_node.label,
-						style = dot_node.style,
-						shape = dot_node.shape,
-						peripheries = dot_node.peripheries
-					)
+					node.name,
+					label = '<%s>' % dot_node.label,
+					style = dot_node.style,
+					shape = dot_node.shape,
+					peripheries = dot_node.peripheries
 			)
 		elif (dot_node.ntype == 'vss'):
-			cluster = pydot.Cluster(
-							graph_name = node.name,
-							suppress_disconnected = False,
-							labelloc = 't',
-							labeljust = 'c',
-							fontsize = self.config.graph.node_text_size,
-							label = '<<br /><b>VSS %s</b>>' % node.vss.domain
-						)
+			graph.start_cluster(
+					node.name,
+					labelloc = 't',
+					labeljust = 'c',
+					fontsize = self.config.graph.node_text_size,
+					label = '<<br /><b>VSS %s</b>>' % node.vss.domain
+			)
 			for i in range(0, 2):
 				serial = ''
 				if (self.config.graph.include_serials == 1):
@@ -531,25 +1070,22 @@ class mnet_graph:
 				
 				vss_label = 'VSS %i - %s%s' % (i, node.vss.members[i].plat, serial)
 
-				cluster.add_node(
-						pydot.Node(
-							name = '%s[mnetVSS%i]' % (node.name, i+1),
-							label = '<%s<br />%s>' % (dot_node.label, vss_label),
-							style = dot_node.style,
-							shape = dot_node.shape,
-							peripheries = dot_node.peripheries
-						)
+				graph.add_node(
+						'%s[mnetVSS%i]' % (node.name, i+1),
+						label = '<%s<br />%s>' % (dot_node.label, vss_label),
+						style = dot_node.style,
+						shape = dot_node.shape,
+						peripheries = dot_node.peripheries
 				)
-			graph.add_subgraph(cluster)
+			graph.end_cluster()
 		elif (dot_node.ntype == 'stackwise'):
-			cluster = pydot.Cluster(
-							graph_name = node.name,
-							suppress_disconnected = False,
-							labelloc = 't',
-							labeljust = 'c',
-							fontsize = self.config.graph.node_text_size,
-							label = '<<br /><b>Stackwise</b>>'
-						)
+			graph.start_cluster(
+					node.name,
+					labelloc = 't',
+					labeljust = 'c',
+					fontsize = self.config.graph.node_text_size,
+					label = '<<br /><b>Stackwise</b>>'
+			)
 			for i in range(0, node.stack.count):
 				serial = ''
 				if (self.config.graph.include_serials == 1):
@@ -558,35 +1094,37 @@ class mnet_graph:
 				smem = node.stack.members[i]
 				sw_label = 'SW %i (%s)<br />%s%s' % (i, smem.role, smem.plat, serial)
 
-				cluster.add_node(
-						pydot.Node(
-							name = '%s[mnetSW%i]' % (node.name, i+1),
-							label = '<%s<br />%s>' % (dot_node.label, sw_label),
-							style = dot_node.style,
-							shape = dot_node.shape,
-							peripheries = dot_node.peripheries
-						)
+				graph.add_node(
+						'%s[mnetSW%i]' % (node.name, i+1),
+						label = '<%s<br />%s>' % (dot_node.label, sw_label),
+						style = dot_node.style,
+						shape = dot_node.shape,
+						peripheries = dot_node.peripheries
 				)
-			graph.add_subgraph(cluster)
+			graph.end_cluster()
 
-		lags = []
-		for link in node.links:
-			self._output_dot(graph, link.node)
+		return 1
 
-			if ((self.config.graph.expand_lag == 1) | (link.local_lag == 'UNKNOWN')):
-				self._output_dot_link(graph, node, link, 0)
-			else:
-				found = 0
-				for lag in lags:
-					if (link.local_lag == lag):
-						found = 1
-						break
-				if (found == 0):
-					lags.append(link.local_lag)
-					self._output_dot_link(graph, node, link, 1)
+
+	#
+	# Add a link to the graph, or its LAG if that isn't in lags yet.
+	# Ends of the link in stubs are drawn to the node's stub.
+	#
+	def _output_dot_links(self, graph, node, link, lags, stubs = None):
+		if ((self.config.graph.expand_lag == 1) | (link.local_lag == 'UNKNOWN')):
+			self._output_dot_link(graph, node, link, 0, stubs)
+		else:
+			found = 0
+			for lag in lags:
+				if (link.local_lag == lag):
+					found = 1
+					break
+			if (found == 0):
+				lags.append(link.local_lag)
+				self._output_dot_link(graph, node, link, 1, stubs)
 
 
-	def _output_dot_link(self, graph, node, link, draw_as_lag):
+	def _output_dot_link(self, graph, node, link, draw_as_lag, stubs = None):
 		link_color = 'black'
 		link_style = 'solid'
 
@@ -658,10 +1196,17 @@ class mnet_graph:
 
 			if (link.local_allowed_vlans == link.remote_allowed_vlans):
 				link_label += '\nAllowed %s' % link.local_allowed_vlans
-			else:
+			elif (link.remote_allowed_vlans == None):
 				link_label += '\nAllowed P:%s' % link.local_allowed_vlans
-				if (link.remote_allowed_vlans != None):
-					link_label += '\nAllowed C:%s' % link.remote_allowed_vlans
+			else:
+				# what both ends allow, then what only one end does
+				local_only = link.local_allowed_vlans - link.remote_allowed_vlans
+				remote_only = link.remote_allowed_vlans - link.local_allowed_vlans
+				link_label += '\nAllowed %s' % (link.local_allowed_vlans & link.remote_allowed_vlans)
+				if (local_only.bits != 0):
+					link_label += '\nAllowed P only:%s' % local_only
+				if (remote_only.bits != 0):
+					link_label += '\nAllowed C only:%s' % remote_only
 		elif (link.link_type is None):
 			# Routed = Bold/Red
 			link_color = 'red'
@@ -676,33 +1221,60 @@ class mnet_graph:
 		lmod = get_module_from_interf(link.local_port)
 		rmod = get_module_from_interf(link.remote_port)
 
+		# stubs are a single graph node, never expanded
+		src_expand = 1
+		dst_expand = 1
+		if (stubs != None):
+			src_expand = 0 if (node in stubs) else 1
+			dst_expand = 0 if (link.node in stubs) else 1
+
 		if (self.config.graph.expand_vss == 1):
-			if (node.vss.enabled == 1):
+			if ((node.vss.enabled == 1) & src_expand):
 				edge_src = '%s[mnetVSS%s]' % (node.name, lmod)
-			if (link.node.vss.enabled == 1):
+			if ((link.node.vss.enabled == 1) & dst_expand):
 				edge_dst = '%s[mnetVSS%s]' % (link.node.name, rmod)
 
 		if (self.config.graph.expand_stackwise == 1):
-			if (node.stack.count > 0):
+			if ((node.stack.count > 0) & src_expand):
 				edge_src = '%s[mnetSW%s]' % (node.name, lmod)
-			if (link.node.stack.count > 0):
+			if ((link.node.stack.count > 0) & dst_expand):
 				edge_dst = '%s[mnetSW%s]' % (link.node.name, rmod)
 
-		edge = pydot.Edge(
-					edge_src, edge_dst,
-					dir = 'forward',
-					label = link_label,
-					color = link_color,
-					style = link_style
-				)
-
-		graph.add_edge(edge)
+		graph.add_edge(
+				edge_src, edge_dst,
+				dir = 'forward',
+				label = link_label,
+				color = link_color,
+				style = link_style
+		)
 
 
 
 	def output_dot(self, dot_file, title):
+		if (self.config.graph.partition != None):
+			self.output_partitions(dot_file, title)
+			return
+
 		self._reset_crawled()
 
+		# nodes and links are written out as they are visited,
+		# graphviz is only run once on the whole graph
+		graph = self._output_dot_open(dot_file, title)
+		if (graph == None):
+			return
+
+		# add all of the nodes and links
+		self._output_dot(graph, self.root_node)
+
+		if (graph.close() == 1):
+			print('Created graph: %s' % dot_file)
+
+
+	#
+	# Start a DOT output with the credits and default attributes.
+	# Returns the writer, or None if it can't be written.
+	#
+	def _output_dot_open(self, dot_file, title):
 		title_text_size = self.config.graph.title_text_size
 		credits = '<table border="0">' \
 					'<tr>' \
@@ -725,13 +1297,22 @@ class mnet_graph:
 		node_text_size = self.config.graph.node_text_size
 		link_text_size = self.config.graph.link_text_size
 
-		graph = pydot.Dot(
+		# get file extension
+		file_name, file_ext = os.path.splitext(dot_file)
+		if (file_ext == ''):
+			print('Error: Output type "%s" does not exist.' % file_ext)
+			return None
+
+		graph = mnet_dot_writer(dot_file, file_ext.lstrip('.'))
+		if (graph.open(
 				graph_type = 'graph',
 				labelloc = 'b',
 				labeljust = 'r',
 				fontsize = node_text_size,
 				label = '<%s>' % credits
-		)
+				) == 0):
+			return None
+
 		graph.set_node_defaults(
 				fontsize = link_text_size
 		)
@@ -740,18 +1321,263 @@ class mnet_graph:
 				labeljust = 'l'
 		)
 
-		# add all of the nodes and links
-		self._output_dot(graph, self.root_node)
+		return graph
+
+
+	#
+	# Output one diagram per partition of the network, with stubs
+	# for the nodes its links lead to in other partitions, and an
+	# overview of the partitions and the links between them.
+	#
+	# network.png is written as network-overview.png and one
+	# network-<partition>.png per partition.  Each diagram is
+	# laid out by its own graphviz, one per CPU at a time.
+	#
+	def output_partitions(self, dot_file, title):
+		mode = self.config.graph.partition
+		if (mode not in PARTITION_MODES):
+			print('Error: Unknown partition type "%s".' % mode)
+			return
+
+		self._reset_crawled()
+
+		names, part_of = self._partition_nodes(mode)
+
+		members = [[] for name in names]
+		for node in self.nodes:
+			members[part_of[node]].append(node)
+
+		# links between partitions, listed on both sides
+		cross = [[] for name in names]
+		for node in self.nodes:
+			for link in node.links:
+				p = part_of[node]
+				q = part_of.get(link.node, p)
+				if (p != q):
+					cross[p].append((node, link))
+					cross[q].append((node, link))
 
-		# get file extension
 		file_name, file_ext = os.path.splitext(dot_file)
+		file_names = self._partition_file_names(file_name, file_ext, names)
 
-		output_func = getattr(graph, 'write_' + file_ext.lstrip('.'))
-		if (output_func == None):
-			print('Error: Output type "%s" does not exist.' % file_ext)
+		running = deque()
+		max_running = cpu_count()
+
+		for i in range(-1, len(names)):
+			if (i < 0):
+				part_file = file_names[-1]
+				graph = self._output_dot_open(part_file, '%s - Overview' % title)
+				if (graph != None):
+					self._output_dot_overview(graph, names, members, part_of)
+			else:
+				part_file = file_names[i]
+				graph = self._output_dot_open(part_file, '%s - %s' % (title, names[i]))
+				if (graph != None):
+					self._output_dot_partition(graph, i, names, members[i], cross[i], part_of)
+
+			if (graph == None):
+				continue
+
+			# let graphviz lay this one out while the next is written
+			graph.end()
+			running.append(graph)
+			if (len(running) >= max_running):
+				self._output_dot_wait(running.popleft())
+
+		while (len(running) > 0):
+			self._output_dot_wait(running.popleft())
+
+
+	def _output_dot_wait(self, graph):
+		if (graph.wait() == 1):
+			print('Created graph: %s' % graph.filename)
+
+
+	#
+	# Output file for each partition, and the overview last.
+	#
+	def _partition_file_names(self, file_name, file_ext, names):
+		file_names = []
+		used = {}
+		for name in names + ['overview']:
+			part = re.sub('[^A-Za-z0-9_.-]', '_', name)
+			n = used.get(part, 0)
+			used[part] = n + 1
+			if (n > 0):
+				part = '%s-%i' % (part, n)
+			file_names.append('%s-%s%s' % (file_name, part, file_ext))
+
+		return file_names
+
+
+	#
+	# Split the nodes into partitions.
+	# Returns (partition names, {node: partition index}).
+	#
+	def _partition_nodes(self, mode):
+		if (mode == 'subnet'):
+			key = {}
+			for node in self.nodes:
+				subnet = None
+				if (node.ip[0] != ''):
+					subnet = ip_subnet(node.ip[0], self.config.graph.partition_prefix)
+				key[node] = subnet if (subnet != None) else 'unknown'
+		elif (mode == 'depth'):
+			key = self._partition_by_depth(self._node_adjacency())
 		else:
-			output_func(dot_file)
-			print('Created graph: %s' % dot_file)
+			key = self._partition_by_core(self._node_adjacency())
+
+		names = []
+		name_idx = {}
+		part_of = {}
+		for node in self.nodes:
+			name = key.get(node, 'unreached')
+			i = name_idx.get(name)
+			if (i == None):
+				i = len(names)
+				name_idx[name] = i
+				names.append(name)
+			part_of[node] = i
+
+		return (names, part_of)
+
+
+	#
+	# Neighbors of each node, whichever side the link was found on.
+	#
+	def _node_adjacency(self):
+		adj = {}
+		for node in self.nodes:
+			adj.setdefault(node, [])
+			for link in node.links:
+				if ((link.node == None) | (link.node == node)):
+					continue
+				adj[node].append(link.node)
+				adj.setdefault(link.node, []).append(node)
+
+		return adj
+
+
+	#
+	# Nodes closer to the root than graph.partition_depth are the
+	# core, every node at that depth starts a partition of its own
+	# holding what is reached through it.
+	#
+	def _partition_by_depth(self, adj):
+		depth = self.config.graph.partition_depth
+		root = self.root_node
+		if (root == None):
+			return {}
+
+		level = {root: 0}
+		key = {root: root.name if (depth <= 0) else 'core'}
+		pending = deque([root])
+		while (len(pending) > 0):
+			node = pending.popleft()
+			for peer in adj.get(node, []):
+				if (peer in level):
+					continue
+				level[peer] = level[node] + 1
+				key[peer] = peer.name if (level[peer] == depth) else key[node]
+				pending.append(peer)
+
+		return key
+
+
+	#
+	# Routers are the core, each group of nodes still connected
+	# without them is a partition named after its first node.
+	# Without routers the root is the core.
+	#
+	def _partition_by_core(self, adj):
+		key = {}
+		for node in self.nodes:
+			if (node.router == 1):
+				key[node] = 'core'
+		if ((len(key) == 0) & (self.root_node != None)):
+			key[self.root_node] = 'core'
+
+		for node in self.nodes:
+			if (node in key):
+				continue
+			key[node] = node.name
+			pending = deque([node])
+			while (len(pending) > 0):
+				n = pending.popleft()
+				for peer in adj.get(n, []):
+					if (peer not in key):
+						key[peer] = node.name
+						pending.append(peer)
+
+		return key
+
+
+	#
+	# Add the nodes of one partition, stubs for the nodes in other
+	# partitions its links lead to, and the links.
+	#
+	def _output_dot_partition(self, graph, part, names, members, cross, part_of):
+		for node in members:
+			self._output_dot_node(graph, node)
+
+		stubs = {}
+		for node, link in cross:
+			for n in [node, link.node]:
+				if ((part_of[n] != part) & (n not in stubs)):
+					stubs[n] = 1
+					self._output_dot_stub(graph, n, names[part_of[n]])
+
+		lags = {}
+		for node in members:
+			for link in node.links:
+				if (part_of.get(link.node) == part):
+					self._output_dot_links(graph, node, link, lags.setdefault(node, []), stubs)
+
+		for node, link in cross:
+			self._output_dot_links(graph, node, link, lags.setdefault(node, []), stubs)
+
+
+	def _output_dot_stub(self, graph, node, partition):
+		graph.add_node(
+				node.name,
+				label = '<<font point-size="10"><b>%s</b></font><br /><i>%s</i>>' % (node.name, partition),
+				style = 'dashed',
+				shape = 'box',
+				peripheries = 1
+		)
+
+
+	#
+	# One node per partition, one edge per pair of partitions
+	# with links between them.
+	#
+	def _output_dot_overview(self, graph, names, members, part_of):
+		for i, name in enumerate(names):
+			root = (self.root_node != None) and (part_of.get(self.root_node) == i)
+			graph.add_node(
+					'mnetPart%i' % i,
+					label = '<<font point-size="10"><b>%s</b></font><br />%i devices>' % (name, len(members[i])),
+					style = 'solid',
+					shape = 'box',
+					peripheries = 2 if root else 1
+			)
+
+		counts = {}
+		for node in self.nodes:
+			for link in node.links:
+				p = part_of[node]
+				q = part_of.get(link.node, p)
+				if (p != q):
+					pair = (min(p, q), max(p, q))
+					counts[pair] = counts.get(pair, 0) + 1
+
+		for p, q in sorted(counts):
+			graph.add_edge(
+					'mnetPart%i' % p, 'mnetPart%i' % q,
+					label = '%i links' % counts[(p, q)],
+					color = 'black',
+					style = 'solid'
+			)
 
 
 	def output_catalog(self, filename):
@@ -761,29 +1587,47 @@ class mnet_graph:
 			print('Unable to open catalog file "%s"' % filename)
 			return
 
-		for n in self.nodes:
-			# get info that we may not have yet
-			n.opts.get_serial = True
-			n.opts.get_plat   = True
-			n.opts.get_bootf  = True
-			n.query_node()
-
-			if (n.stack.count > 0):
-				# stackwise
-				for smem in n.stack.members:
-					serial = smem.serial or 'NOT CONFIGURED TO POLL'
-					plat   = smem.plat or 'NOT CONFIGURED TO POLL'
-					f.write('"%s","%s","%s","%s","%s","STACK","%s"\n' % (n.name, n.ip[0], plat, n.ios, serial, n.bootfile))
-			elif (n.vss.enabled != 0):
-				#vss
-				for i in range(0, 2):
-					serial = n.vss.members[i].serial
-					plat   = n.vss.members[i].plat
-					ios    = n.vss.members[i].ios
-					f.write('"%s","%s","%s","%s","%s","VSS","%s"\n' % (n.name, n.ip[0], plat, ios, serial, n.bootfile))
-			else:
-				# stand alone
-				f.write('"%s","%s","%s","%s","%s","","%s"\n' % (n.name, n.ip[0], n.plat, n.ios, n.serial, n.bootfile))
+		# fill in what the crawl didn't get a few nodes at a time,
+		# writing the rows in node order as they are ready
+		pool = ThreadPool(max(1, self.config.graph.chassis_workers))
+		try:
+			for n in pool.imap(self._get_catalog_info, self.nodes):
+				self._output_catalog_node(f, n)
+		finally:
+			pool.close()
+			pool.join()
 
 		f.close()
 
+
+	#
+	# Query the catalog fields a node is still missing.
+	# Returns the node.
+	#
+	def _get_catalog_info(self, node):
+		if ((node.bootfile == None) | ((node.serial == None) & (node.stack.count == 0) & (node.vss.enabled == 0))):
+			node.opts.get_serial = True
+			node.opts.get_bootf  = True
+			node.query_node()
+
+		return node
+
+
+	def _output_catalog_node(self, f, n):
+		if (n.stack.count > 0):
+			# stackwise
+			for smem in n.stack.members:
+				serial = smem.serial or 'NOT CONFIGURED TO POLL'
+				plat   = smem.plat or 'NOT CONFIGURED TO POLL'
+				f.write('"%s","%s","%s","%s","%s","STACK","%s"\n' % (n.name, n.ip[0], plat, n.ios, serial, n.bootfile))
+		elif (n.vss.enabled != 0):
+			#vss
+			for i in range(0, 2):
+				serial = n.vss.members[i].serial
+				plat   = n.vss.members[i].plat
+				ios    = n.vss.members[i].ios
+				f.write('"%s","%s","%s","%s","%s","VSS","%s"\n' % (n.name, n.ip[0], plat, ios, serial, n.bootfile))
+		else:
+			# stand alone
+			f.write('"%s","%s","%s","%s","%s","","%s"\n' % (n.name, n.ip[0], n.plat, n.ios, n.serial, n.bootfile))
+
@@ -28,36 +28,47 @@ from snmp import *
 from util import *
 import sys
 
-class mnet_node_link:
+# read by get_markers(), in this order
+MARKER_OIDS = [OID_SYS_UPTIME, OID_CDP_LAST_CHANGE, OID_LLDP_LAST_CHANGE]
+
+# allowed VLAN bitmaps of a trunk, 1024 VLANs each
+TRUNK_ALLOW_OIDS = [OID_TRUNK_ALLOW, OID_TRUNK_ALLOW_2K, OID_TRUNK_ALLOW_3K, OID_TRUNK_ALLOW_4K]
+
+class mnet_node_link(object):
 	'''
 	Generic link to another node.
 	CDP and LLDP neighbors are discovered
 	and returned as mnet_node_link objects.
+
+	Large crawls hold a lot of these, so the
+	fields are slots rather than a dict.
 	'''
-	# the linked node
-	node                  = None
-
-	# description of the link
-	link_type             = None
-	remote_ip             = None
-	remote_name           = None
-	vlan                  = None
-	local_native_vlan     = None
-	local_allowed_vlans   = None
-	remote_native_vlan    = None
-	remote_allowed_vlans  = None
-	local_port            = None
-	remote_port           = None
-	local_lag             = None
-	remote_lag            = None
-	local_lag_ips         = []
-	remote_lag_ips        = []
-	local_if_ip           = None
-	remote_if_ip          = None
-	remote_platform       = None
-	remote_ios            = None
-	remote_mac            = None
-	discovered_proto      = None
+	__slots__ = (
+		# the linked node
+		'node',
+
+		# description of the link
+		'link_type',
+		'remote_ip',
+		'remote_name',
+		'vlan',
+		'local_native_vlan',
+		'local_allowed_vlans',
+		'remote_native_vlan',
+		'remote_allowed_vlans',
+		'local_port',
+		'remote_port',
+		'local_lag',
+		'remote_lag',
+		'local_lag_ips',
+		'remote_lag_ips',
+		'local_if_ip',
+		'remote_if_ip',
+		'remote_platform',
+		'remote_ios',
+		'remote_mac',
+		'discovered_proto'
+	)
 
 	def __init__(
 				self,
@@ -74,8 +85,8 @@ class mnet_node_link:
 				remote_port             = None,
 				local_lag               = None,
 				remote_lag              = None,
-				local_lag_ips           = [],
-				remote_lag_ips          = [],
+				local_lag_ips           = None,
+				remote_lag_ips          = None,
 				local_if_ip             = None,
 				remote_if_ip            = None,
 				remote_platform         = None,
@@ -96,8 +107,8 @@ class mnet_node_link:
 		self.remote_port                = remote_port
 		self.local_lag                  = local_lag
 		self.remote_lag                 = remote_lag
-		self.local_lag_ips              = local_lag_ips
-		self.remote_lag_ips             = remote_lag_ips
+		self.local_lag_ips              = local_lag_ips if (local_lag_ips != None) else []
+		self.remote_lag_ips             = remote_lag_ips if (remote_lag_ips != None) else []
 		self.local_if_ip                = local_if_ip
 		self.remote_if_ip               = remote_if_ip
 		self.remote_platform            = remote_platform
@@ -105,33 +116,35 @@ class mnet_node_link:
 		self.remote_mac                 = remote_mac
 		self.discovered_proto           = discovered_proto
 
+	#
+	# copy.copy() of a slotted object, without going
+	# through the generic __reduce_ex__ path.
+	#
+	def __copy__(self):
+		link = mnet_node_link.__new__(mnet_node_link)
+		for f in mnet_node_link.__slots__:
+			setattr(link, f, getattr(self, f))
+		return link
+
 
-class mnet_node_svi:
-	vlan = None
-	ip = None
+class mnet_node_svi(object):
+	__slots__ = ('vlan', 'ip')
 
 	def __init__(self, vlan):
 		self.vlan = vlan
 		self.ip = []
 
 
-class mnet_node_lo:
-	name = None
-	ips = []
+class mnet_node_lo(object):
+	__slots__ = ('name', 'ips')
 
 	def __init__(self, name, ips):
 		self.name = name.replace('Loopback', 'lo')
 		self.ips = ips
 
 
-class mnet_node_stack_member:
-	num = 0
-	role = 0
-	pri = 0
-	mac = None
-	img = None
-	serial = None
-	plat = None
+class mnet_node_stack_member(object):
+	__slots__ = ('num', 'role', 'pri', 'mac', 'img', 'serial', 'plat')
 
 	def __init__(self):
 		self.num = 0
@@ -143,9 +156,8 @@ class mnet_node_stack_member:
 		self.plat = None
 
 
-class mnet_node_stack:
-	members = []
-	count = 0
+class mnet_node_stack(object):
+	__slots__ = ('members', 'count')
 
 	def __init__(self, snmpobj = None, get_details = 0):
 		self.members = []
@@ -155,54 +167,47 @@ class mnet_node_stack:
 			self.get_members(snmpobj, get_details)
 
 	def get_members(self, snmpobj, get_details):
-		vbtbl = snmpobj.get_bulk(OID_STACK)
+		vbtbl = snmpobj.get_bulk(OID_STACK, indexed=True)
 		if (vbtbl == None):
 			return None
 
 		if (get_details == 0):
-			self.count = 0
-			for row in vbtbl:
-				for n, v in row:
-					if (n.prettyPrint().startswith(OID_STACK_NUM + '.')):
-						self.count += 1
+			self.count = len(vbtbl.column(OID_STACK_NUM))
 
 			if (self.count == 1):
 				self.count = 0
 			return				
 
-		serial_vbtbl = snmpobj.get_bulk(OID_ENTPHYENTRY_SERIAL)
-		platf_vbtbl  = snmpobj.get_bulk(OID_ENTPHYENTRY_PLAT)
+		serial_vbtbl = snmpobj.get_bulk(OID_ENTPHYENTRY_SERIAL, indexed=True)
+		platf_vbtbl  = snmpobj.get_bulk(OID_ENTPHYENTRY_PLAT, indexed=True)
 
-		for row in vbtbl:
-			for n, v in row:
-				if (n.prettyPrint().startswith(OID_STACK_NUM + '.')):
-					m = mnet_node_stack_member()
+		for (sidx, v) in vbtbl.column(OID_STACK_NUM):
+			m = mnet_node_stack_member()
 
-					t = n.prettyPrint().split('.')
-					idx = t[14]
+			idx = str(sidx[0])
 
-					m.num  = v
-					m.role = snmpobj.cache_lookup(vbtbl, OID_STACK_ROLE + '.' + idx)
-					m.pri  = snmpobj.cache_lookup(vbtbl, OID_STACK_PRI + '.' + idx)
-					m.mac  = snmpobj.cache_lookup(vbtbl, OID_STACK_MAC + '.' + idx)
-					m.img  = snmpobj.cache_lookup(vbtbl, OID_STACK_IMG + '.' + idx)
+			m.num  = pretty_val(v)
+			m.role = snmpobj.cache_lookup(vbtbl, OID_STACK_ROLE + '.' + idx)
+			m.pri  = snmpobj.cache_lookup(vbtbl, OID_STACK_PRI + '.' + idx)
+			m.mac  = snmpobj.cache_lookup(vbtbl, OID_STACK_MAC + '.' + idx)
+			m.img  = snmpobj.cache_lookup(vbtbl, OID_STACK_IMG + '.' + idx)
 
-					m.serial = snmpobj.cache_lookup(serial_vbtbl, OID_ENTPHYENTRY_SERIAL + '.' + idx)
-					m.plat   = snmpobj.cache_lookup(platf_vbtbl, OID_ENTPHYENTRY_PLAT + '.' + idx)
+			m.serial = snmpobj.cache_lookup(serial_vbtbl, OID_ENTPHYENTRY_SERIAL + '.' + idx)
+			m.plat   = snmpobj.cache_lookup(platf_vbtbl, OID_ENTPHYENTRY_PLAT + '.' + idx)
 
-					if (m.role == '1'):
-						m.role = 'master'
-					elif (m.role == '2'):
-						m.role = 'member'
-					elif (m.role == '3'):
-						m.role = 'notMember'
-					elif (m.role == '4'):
-						m.role = 'standby'
+			if (m.role == '1'):
+				m.role = 'master'
+			elif (m.role == '2'):
+				m.role = 'member'
+			elif (m.role == '3'):
+				m.role = 'notMember'
+			elif (m.role == '4'):
+				m.role = 'standby'
 
-					mac_seg = [m.mac[x:x+4] for x in xrange(2, len(m.mac), 4)]
-					m.mac = '.'.join(mac_seg)
+			mac_seg = [m.mac[x:x+4] for x in xrange(2, len(m.mac), 4)]
+			m.mac = '.'.join(mac_seg)
 
-					self.members.append(m)
+			self.members.append(m)
 
 		self.count = len(self.members)
 		if (self.count == 1):
@@ -211,10 +216,8 @@ class mnet_node_stack:
 		return
 
 
-class mnet_node_vss_member:
-	ios = None
-	serial = None
-	plat = None
+class mnet_node_vss_member(object):
+	__slots__ = ('ios', 'serial', 'plat')
 
 	def __init__(self):
 		self.ios = None
@@ -222,72 +225,73 @@ class mnet_node_vss_member:
 		self.plat = None
 
 
-class mnet_node_vss:
-	members = []
-	enabled = 0
-	domain = None
+class mnet_node_vss(object):
+	__slots__ = ('members', 'enabled', 'domain')
 
 	def __init__(self, snmpobj = None, get_details = 0):
 		self.members = [ mnet_node_vss_member(), mnet_node_vss_member() ]
-		enabled = 0
-		domain = None
+		self.enabled = 0
+		self.domain = None
 
 		if (snmpobj != None):
 			self.get_members(snmpobj, get_details)
 
 	def get_members(self, snmpobj, get_details):
-		self.enabled = 1 if (snmpobj.get_val(OID_VSS_MODE) == '2') else 0
+		vss_mode, vss_domain = snmpobj.get_vals([OID_VSS_MODE, OID_VSS_DOMAIN])
+
+		self.enabled = 1 if (vss_mode == '2') else 0
 		if (self.enabled == 0):
 			return
 
-		self.domain = snmpobj.get_val(OID_VSS_DOMAIN)
+		self.domain = vss_domain
 
 		if (get_details == 0):
 			return
 
-		class_vbtbl  = snmpobj.get_bulk(OID_ENTPHYENTRY_CLASS)
-		ios_vbtbl    = snmpobj.get_bulk(OID_ENTPHYENTRY_SOFTWARE)
-		serial_vbtbl = snmpobj.get_bulk(OID_ENTPHYENTRY_SERIAL)
-		plat_vbtbl   = snmpobj.get_bulk(OID_ENTPHYENTRY_PLAT)
+		class_vbtbl  = snmpobj.get_bulk(OID_ENTPHYENTRY_CLASS, indexed=True)
+		ios_vbtbl    = snmpobj.get_bulk(OID_ENTPHYENTRY_SOFTWARE, indexed=True)
+		serial_vbtbl = snmpobj.get_bulk(OID_ENTPHYENTRY_SERIAL, indexed=True)
+		plat_vbtbl   = snmpobj.get_bulk(OID_ENTPHYENTRY_PLAT, indexed=True)
 
 		module = 0
 
-		for row in class_vbtbl:
-			for n, v in row:
-				if (v == 9):
-					t = n.prettyPrint().split('.')
-					modidx = t[12]
-					if (module > 1):
-						print('[E] More than 2 modules found for VSS device! Skipping after the second...')
-						return
-
-					self.members[module].ios    = snmpobj.cache_lookup(ios_vbtbl, OID_ENTPHYENTRY_SOFTWARE + '.' + modidx)
-					self.members[module].serial = snmpobj.cache_lookup(serial_vbtbl, OID_ENTPHYENTRY_SERIAL + '.' + modidx)
-					self.members[module].plat   = snmpobj.cache_lookup(plat_vbtbl, OID_ENTPHYENTRY_PLAT + '.' + modidx)
-					module += 1
-
-
-class mnet_node:
-
-	class _node_opts:
-		get_name = False
-		get_ip = False
-		get_plat = False
-		get_ios = False
-		get_router = False
-		get_ospf_id = False
-		get_bgp_las = False
-		get_hsrp_pri = False
-		get_hsrp_vip = False
-		get_serial = False
-		get_stack = False
-		get_stack_details = False
-		get_vss = False
-		get_vss_details = False
-		get_svi = False
-		get_lo = False
-		get_bootf = False
-		get_chassis_info = False
+		for (idx, v) in class_vbtbl.column(OID_ENTPHYENTRY_CLASS):
+			if (v == ENTPHYCLASS_MODULE):
+				modidx = str(idx[0])
+				if (module > 1):
+					print('[E] More than 2 modules found for VSS device! Skipping after the second...')
+					return
+
+				self.members[module].ios    = snmpobj.cache_lookup(ios_vbtbl, OID_ENTPHYENTRY_SOFTWARE + '.' + modidx)
+				self.members[module].serial = snmpobj.cache_lookup(serial_vbtbl, OID_ENTPHYENTRY_SERIAL + '.' + modidx)
+				self.members[module].plat   = snmpobj.cache_lookup(plat_vbtbl, OID_ENTPHYENTRY_PLAT + '.' + modidx)
+				module += 1
+
+
+class mnet_node(object):
+
+	class _node_opts(object):
+		__slots__ = (
+			'get_name',
+			'get_ip',
+			'get_plat',
+			'get_ios',
+			'get_router',
+			'get_ospf_id',
+			'get_bgp_las',
+			'get_hsrp_pri',
+			'get_hsrp_vip',
+			'get_serial',
+			'get_stack',
+			'get_stack_details',
+			'get_vss',
+			'get_vss_details',
+			'get_svi',
+			'get_lo',
+			'get_bootf',
+			'get_chassis_info',
+			'get_markers'
+		)
 	
 		def __init__(self):
 			self.reset()
@@ -311,42 +315,58 @@ class mnet_node:
 			self.get_lo = False
 			self.get_bootf = False
 			self.get_chassis_info = False
-
-
-	opts = None
-	snmpobj			= mnet_snmp()
-	crawled = 0
-	links = []
-
-	name			= None
-	ip				= []
-	plat			= None
-	ios				= None
-	router			= None
-	ospf_id			= None
-	bgp_las			= None
-	hsrp_pri		= None
-	hsrp_vip		= None
-	serial			= None
-	bootfile		= None
-
-	svis			= []
-	loopbacks		= []
-	stack			= None
-	vss				= None
-
-	# cached MIB trees
-	cdp_vbtbl		= None
-	lldp_vbtbl		= None
-	link_type_vbtbl	= None
-	lag_vbtbl		= None
-	vlan_vbtbl		= None
-	ifname_vbtbl	= None
-	ifip_vbtbl		= None
-	svi_vbtbl       = None
-	ethif_vbtbl		= None
-	trk_allowed_vbtbl = None
-	trk_native_vbtbl  = None
+			self.get_markers = False
+
+
+	__slots__ = (
+		'opts',
+		'snmpobj',
+		'crawled',
+		'links',
+
+		'name',
+		'ip',
+		'plat',
+		'ios',
+		'router',
+		'ospf_id',
+		'bgp_las',
+		'hsrp_pri',
+		'hsrp_vip',
+		'serial',
+		'bootfile',
+
+		# sysUpTime and the CDP/LLDP table last change times,
+		# to tell if the neighbors changed since the last crawl
+		'sys_uptime',
+		'cdp_last_change',
+		'lldp_last_change',
+
+		# CDP and LLDP neighbors as last read, see graph._get_neighbors()
+		'neighbors',
+
+		'svis',
+		'loopbacks',
+		'stack',
+		'vss',
+
+		# cached MIB trees, see release_tables()
+		'cdp_vbtbl',
+		'lldp_vbtbl',
+		'link_type_vbtbl',
+		'lag_vbtbl',
+		'vlan_vbtbl',
+		'ifname_vbtbl',
+		'ifip_vbtbl',
+		'svi_vbtbl',
+		'ethif_vbtbl',
+		'trk_allowed_vbtbl',
+		'trk_native_vbtbl',
+		'chassis_vbtbl',
+
+		# ifIndex -> [CIDR] from ifip_vbtbl, see _get_cidrs_from_ifidx()
+		'ifip_cidrs'
+	)
 
 	def __init__(self):
 		self.opts				= mnet_node._node_opts()
@@ -366,6 +386,10 @@ class mnet_node:
 		self.hsrp_vip			= None
 		self.serial				= None
 		self.bootfile			= None
+		self.sys_uptime			= None
+		self.cdp_last_change	= None
+		self.lldp_last_change	= None
+		self.neighbors			= None
 
 		self.svis = []
 		self.loopbacks = []
@@ -374,7 +398,7 @@ class mnet_node:
 		self.vss = mnet_node_vss()
 
 		self.cdp_vbtbl          = None
-		self.ldp_vbtbl          = None
+		self.lldp_vbtbl         = None
 		self.link_type_vbtbl	= None
 		self.lag_vbtbl          = None
 		self.vlan_vbtbl         = None
@@ -384,17 +408,39 @@ class mnet_node:
 		self.ethif_vbtbl        = None
 		self.trk_allowed_vbtbl  = None
 		self.trk_native_vbtbl   = None
+		self.chassis_vbtbl      = None
+		self.ifip_cidrs         = None
 
 
 	def add_link(self, link):
 		self.links.append(link)
 
 
+	#
+	# Drop the MIB tables read for the neighbors once they are
+	# parsed, a large crawl can't keep them for every node.
+	# They are fetched again if they are needed later.
+	#
+	def release_tables(self):
+		self.cdp_vbtbl          = None
+		self.lldp_vbtbl         = None
+		self.link_type_vbtbl	= None
+		self.lag_vbtbl          = None
+		self.vlan_vbtbl         = None
+		self.ifname_vbtbl       = None
+		self.ifip_vbtbl         = None
+		self.svi_vbtbl          = None
+		self.ethif_vbtbl        = None
+		self.trk_allowed_vbtbl  = None
+		self.trk_native_vbtbl   = None
+		self.ifip_cidrs         = None
+
+
 	# find valid credentials for this node
-	def try_snmp_creds(self, snmp_creds):
+	def try_snmp_creds(self, snmp_creds, cred_cache = None, dead_cache = None):
 		if (self.snmpobj.success == 0):
 			self.snmpobj._ip = self.ip[0]
-			if (self.snmpobj.get_cred(snmp_creds) == 0):
+			if (self.snmpobj.get_cred(snmp_creds, cred_cache, dead_cache) == 0):
 				return 0
 		return 1
 
@@ -408,29 +454,54 @@ class mnet_node:
 
 		snmpobj = self.snmpobj
 
+		# fetch all of the scalars we may need in one request.
+		# some are only used depending on the others.
+		oids = []
+		if (self.opts.get_router == True):
+			if (self.router == None):
+				oids.append(OID_IP_ROUTING)
+			if (self.router != 0):
+				if (self.opts.get_ospf_id == True):
+					oids.extend([OID_OSPF, OID_OSPF_ID])
+				if (self.opts.get_bgp_las == True):
+					oids.append(OID_BGP_LAS)
+				if (self.opts.get_hsrp_pri == True):
+					oids.extend([OID_HSRP_PRI, OID_HSRP_VIP])
+		if (self.opts.get_serial == 1):
+			oids.append(OID_SYS_SERIAL)
+		if (self.opts.get_bootf):
+			oids.append(OID_SYS_BOOT)
+		if (self.opts.get_markers):
+			oids.extend(MARKER_OIDS)
+
+		vals = dict(zip(oids, snmpobj.get_vals(oids)))
+
+		if (self.opts.get_markers):
+			self._set_markers([vals[oid] for oid in MARKER_OIDS])
+
 		# router
 		if (self.opts.get_router == True):
 			if (self.router == None):
-				self.router = 1 if (snmpobj.get_val(OID_IP_ROUTING) == '1') else 0
+				self.router = 1 if (vals[OID_IP_ROUTING] == '1') else 0
 
 			if (self.router == 1):
 				# OSPF
 				if (self.opts.get_ospf_id == True):
-					self.ospf_id = snmpobj.get_val(OID_OSPF)
+					self.ospf_id = vals[OID_OSPF]
 					if (self.ospf_id != None):
-						self.ospf_id = snmpobj.get_val(OID_OSPF_ID)
+						self.ospf_id = vals[OID_OSPF_ID]
 
 				# BGP
 				if (self.opts.get_bgp_las == True):
-					self.bgp_las = snmpobj.get_val(OID_BGP_LAS)
+					self.bgp_las = vals[OID_BGP_LAS]
 					if (self.bgp_las == '0'):	# 4500x is reporting 0 with disabled
 						self.bgp_las = None
 
 				# HSRP
 				if (self.opts.get_hsrp_pri == True):
-					self.hsrp_pri = snmpobj.get_val(OID_HSRP_PRI)
+					self.hsrp_pri = vals[OID_HSRP_PRI]
 					if (self.hsrp_pri != None):
-						self.hsrp_vip = snmpobj.get_val(OID_HSRP_VIP)
+						self.hsrp_vip = vals[OID_HSRP_VIP]
 
 		# stack
 		if (self.opts.get_stack):
@@ -442,43 +513,45 @@ class mnet_node:
 		
 		# serial
 		if ((self.opts.get_serial == 1) & (self.stack.count == 0) & (self.vss.enabled == 0)):
-			self.serial = snmpobj.get_val(OID_SYS_SERIAL)
+			self.serial = vals[OID_SYS_SERIAL]
 
 		# SVI
 		if (self.opts.get_svi == True):
 			if (self.svi_vbtbl == None):
-				self.svi_vbtbl		= snmpobj.get_bulk(OID_SVI_VLANIF)
+				self.svi_vbtbl		= snmpobj.get_bulk(OID_SVI_VLANIF, indexed=True)
 
 			if (self.ifip_vbtbl == None):
-				self.ifip_vbtbl		= snmpobj.get_bulk(OID_IF_IP)
+				self.ifip_vbtbl		= snmpobj.get_bulk(OID_IF_IP, indexed=True)
 
-			for row in self.svi_vbtbl:
-				for n, v in row:
-					vlan = n.prettyPrint().split('.')[14]
-					svi = mnet_node_svi(vlan)
-					svi_ips = self._get_cidrs_from_ifidx(v)
-					svi.ip.extend(svi_ips)
-					self.svis.append(svi)
+			for (idx, v) in self.svi_vbtbl.column(OID_SVI_VLANIF):
+				vlan = str(idx[0])
+				svi = mnet_node_svi(vlan)
+				svi_ips = self._get_cidrs_from_ifidx(v)
+				svi.ip.extend(svi_ips)
+				self.svis.append(svi)
 
 		# loopback
 		if (self.opts.get_lo == True):
-			self.ethif_vbtbl = snmpobj.get_bulk(OID_ETH_IF)
+			self.ethif_vbtbl = snmpobj.get_bulk(OID_ETH_IF, indexed=True)
 
 			if (self.ifip_vbtbl == None):
-				self.ifip_vbtbl = snmpobj.get_bulk(OID_IF_IP)
+				self.ifip_vbtbl = snmpobj.get_bulk(OID_IF_IP, indexed=True)
 			
-			for row in self.ethif_vbtbl:
-				for n, v in row:
-					if (n.prettyPrint().startswith(OID_ETH_IF_TYPE) & (v == 24)):
-						ifidx = n.prettyPrint().split('.')[10]
-						lo_name = snmpobj.cache_lookup(self.ethif_vbtbl, OID_ETH_IF_DESC + '.' + ifidx)
-						lo_ips = self._get_cidrs_from_ifidx(ifidx)
-						lo = mnet_node_lo(lo_name, lo_ips) 
-						self.loopbacks.append(lo)
+			for (idx, v) in self.ethif_vbtbl.column(OID_ETH_IF_TYPE):
+				if (v == 24):
+					ifidx = str(idx[0])
+					lo_name = snmpobj.cache_lookup(self.ethif_vbtbl, OID_ETH_IF_DESC + '.' + ifidx)
+					lo_ips = self._get_cidrs_from_ifidx(ifidx)
+					lo = mnet_node_lo(lo_name, lo_ips) 
+					self.loopbacks.append(lo)
+
+		# only needed above
+		self.svi_vbtbl = None
+		self.ethif_vbtbl = None
 
 		# bootfile
 		if (self.opts.get_bootf):
-			self.bootfile = snmpobj.get_val(OID_SYS_BOOT)
+			self.bootfile = vals[OID_SYS_BOOT]
 
 		# chassis info (serial, IOS, platform)
 		if (self.opts.get_chassis_info):
@@ -489,43 +562,97 @@ class mnet_node:
 		return 1
 
 
+	#
+	# Read sysUpTime and the CDP/LLDP last change times.
+	# Call before reading the neighbors so a change in between
+	# is seen on the next crawl.
+	#
+	def get_markers(self):
+		self._set_markers(self.snmpobj.get_vals(MARKER_OIDS))
+
+
+	def _set_markers(self, vals):
+		self.sys_uptime, self.cdp_last_change, self.lldp_last_change = vals
+
+
+	#
+	# Returns 1 if the markers read by get_markers() show the
+	# neighbors can't have changed since they were read on prev.
+	#
+	def markers_unchanged(self, prev):
+		try:
+			uptime = int(self.sys_uptime)
+			prev_uptime = int(prev.sys_uptime)
+		except (TypeError, ValueError):
+			return 0
+
+		# rebooted
+		if (uptime < prev_uptime):
+			return 0
+
+		# nothing to go by
+		if ((self.cdp_last_change == None) & (self.lldp_last_change == None)):
+			return 0
+
+		if ((self.cdp_last_change != prev.cdp_last_change) | (self.lldp_last_change != prev.lldp_last_change)):
+			return 0
+
+		return 1
+
+
 	def _get_cidrs_from_ifidx(self, ifidx):
-		ips = []
+		if (self.ifip_cidrs == None):
+			if (self.ifip_vbtbl == None):
+				return []
+			self.ifip_cidrs = self._parse_ifip_cidrs(self.ifip_vbtbl)
+
+		return list(self.ifip_cidrs.get(str(ifidx), []))
+
+
+	#
+	# Go through the IP address table once and group the
+	# addresses by ifIndex as CIDRs, in table order.
+	#
+	def _parse_ifip_cidrs(self, vbtbl):
+		cidrs = {}
+		mask_bits = {}
+
+		for (idx, vals) in vbtbl.instances([OID_IF_IP_ADDR, OID_IF_IP_NETM]):
+			ifidx = str(vals[0])
+			ip = '.'.join([str(x) for x in idx])
 
-		for ifrow in self.ifip_vbtbl:
-			for ifn, ifv in ifrow:
-				if (ifn.prettyPrint().startswith(OID_IF_IP_ADDR)):
-					if (str(ifv) == str(ifidx)):
-						t = ifn.prettyPrint().split('.')
-						ip = ".".join(t[10:])
-						mask = self.snmpobj.cache_lookup(self.ifip_vbtbl, OID_IF_IP_NETM + ip)
-						nbits = get_net_bits_from_mask(mask)
-						cidr = '%s/%i' % (ip, nbits)
-						ips.append(cidr)
-		return ips
+			mask = vals[1]
+			nbits = mask_bits.get(mask)
+			if (nbits == None):
+				nbits = get_net_bits_from_mask(mask) if (mask != None) else 32
+				mask_bits[mask] = nbits
+
+			cidrs.setdefault(ifidx, []).append('%s/%i' % (ip, nbits))
+
+		return cidrs
 
 
 	def _cache_common_mibs(self):
 		if (self.link_type_vbtbl == None):
-			self.link_type_vbtbl = self.snmpobj.get_bulk(OID_TRUNK_VTP)
+			self.link_type_vbtbl = self.snmpobj.get_bulk(OID_TRUNK_VTP, indexed=True)
 
 		if (self.lag_vbtbl == None):
-			self.lag_vbtbl = self.snmpobj.get_bulk(OID_LAG_LACP)
+			self.lag_vbtbl = self.snmpobj.get_bulk(OID_LAG_LACP, indexed=True)
 
 		if (self.vlan_vbtbl == None):
-			self.vlan_vbtbl	= self.snmpobj.get_bulk(OID_IF_VLAN)
+			self.vlan_vbtbl	= self.snmpobj.get_bulk(OID_IF_VLAN, indexed=True)
 
 		if (self.ifname_vbtbl == None):
-			self.ifname_vbtbl = self.snmpobj.get_bulk(OID_IFNAME)
+			self.ifname_vbtbl = self.snmpobj.get_bulk(OID_IFNAME, indexed=True)
 
 		if (self.trk_allowed_vbtbl == None):
-			self.trk_allowed_vbtbl = self.snmpobj.get_bulk(OID_TRUNK_ALLOW)
+			self.trk_allowed_vbtbl = self.snmpobj.get_columns(TRUNK_ALLOW_OIDS)
 
 		if (self.trk_native_vbtbl == None):
-			self.trk_native_vbtbl = self.snmpobj.get_bulk(OID_TRUNK_NATIVE)
+			self.trk_native_vbtbl = self.snmpobj.get_bulk(OID_TRUNK_NATIVE, indexed=True)
 
 		if (self.ifip_vbtbl == None):
-			self.ifip_vbtbl = self.snmpobj.get_bulk(OID_IF_IP)
+			self.ifip_vbtbl = self.snmpobj.get_bulk(OID_IF_IP, indexed=True)
 
 
 	#
@@ -536,57 +663,47 @@ class mnet_node:
 		neighbors = []
 		snmpobj = self.snmpobj
 		
-		# get list of CDP neighbors
-		self.cdp_vbtbl = snmpobj.get_bulk(OID_CDP)
+		# get list of CDP neighbors, only the columns we use
+		cdp_cols = [
+				OID_CDP_DEVID,
+				OID_CDP_IPADDR,
+				OID_CDP_DEVPORT,
+				OID_CDP_IOS
+		]
+		self.cdp_vbtbl = snmpobj.get_columns(cdp_cols)
 		if (self.cdp_vbtbl == None):
 			return None
 
 		# cache some common MIB trees
 		self._cache_common_mibs()
 		
-		for row in self.cdp_vbtbl:
-			for name, val in row:
-				# process only if this row is a CDP_DEVID
-				if (name.prettyPrint().startswith(OID_CDP_DEVID) == 0):
-					continue
+		for (idx, vals) in self.cdp_vbtbl.instances(cdp_cols):
+			ifidx = str(idx[0])
+			ifidx2 = str(idx[1])
+			devid, rip, rport, rios = vals
 
-				t = name.prettyPrint().split('.')
-				ifidx = t[14]
-				ifidx2 = t[15]
+			# get remote IP
+			rip = convert_ip_octets_str(rip)
 
-				# get remote IP
-				rip = snmpobj.cache_lookup(self.cdp_vbtbl, OID_CDP_IPADDR + '.' + ifidx + '.' + ifidx2)
-				rip = convert_ip_int_str(rip)
+			# get local port
+			lport = self._get_ifname(ifidx)
 
-				# get local port
-				lport = self._get_ifname(ifidx)
+			# get remote port
+			rport = shorten_port_name(pretty_val(rport))
 
-				# get remote port
-				rport = snmpobj.cache_lookup(self.cdp_vbtbl, OID_CDP_DEVPORT + '.' + ifidx + '.' + ifidx2)
-				rport = shorten_port_name(rport)
+			# get IOS version
+			if (rios != None):
+				rios = self._format_ios_ver(rios)
 
-				# get remote platform
-				rplat = snmpobj.cache_lookup(self.cdp_vbtbl, OID_CDP_DEVPLAT + '.' + ifidx + '.' + ifidx2)
+			link                  = self._get_node_link_info(ifidx, ifidx2)
+			link.remote_name      = pretty_val(devid)
+			link.remote_ip        = rip
+			link.discovered_proto = 'cdp'
+			link.local_port       = lport
+			link.remote_port      = rport
+			link.remote_ios       = rios
 
-				# get IOS version
-				rios = snmpobj.cache_lookup(self.cdp_vbtbl, OID_CDP_IOS + '.' + ifidx + '.' + ifidx2)
-				if (rios != None):
-					try:
-						rios = binascii.unhexlify(rios[2:])
-					except:
-						pass
-					rios = self._format_ios_ver(rios)
-
-				link                  = self._get_node_link_info(ifidx, ifidx2)
-				link.remote_name      = val.prettyPrint()
-				link.remote_ip        = rip
-				link.discovered_proto = 'cdp'
-				link.local_port       = lport
-				link.remote_port      = rport
-				link.remote_plat      = rplat
-				link.remote_ios       = rios
-
-				neighbors.append(link)
+			neighbors.append(link)
 
 		return neighbors
 
@@ -599,68 +716,86 @@ class mnet_node:
 		neighbors = []
 		snmpobj = self.snmpobj
 		
-		self.lldp_vbtbl = snmpobj.get_bulk(OID_LLDP)
+		# the remote table columns we use and the management addresses
+		lldp_cols = [
+				OID_LLDP_TYPE,
+				OID_LLDP_DEVID,
+				OID_LLDP_DEVPORT,
+				OID_LLDP_DEVNAME,
+				OID_LLDP_DEVDESC
+		]
+		self.lldp_vbtbl = snmpobj.get_columns(lldp_cols + [OID_LLDP_DEVADDR])
 		if (self.lldp_vbtbl == None):
 			return None
 
 		self._cache_common_mibs()
+
+		man_addrs = self._get_lldp_man_addrs()
 		
-		for row in self.lldp_vbtbl:
-			for name, val in row:
-				if (name.prettyPrint().startswith(OID_LLDP_TYPE) == 0):
-					continue
+		for (idx, vals) in self.lldp_vbtbl.instances(lldp_cols):
+			ifidx = str(idx[0])
+			ifidx2 = str(idx[1])
+			rtype, devid, rport, name, rimg = vals
+
+			rip = ''
+			addrs = man_addrs.get(idx[:2])
+			if (addrs != None):
+				rip = addrs[0]
+
+			lport = self._get_ifname(ifidx)
+
+			rport = shorten_port_name(pretty_val(rport))
+
+			devid = pretty_val(devid)
+			try:
+				mac_seg = [devid[x:x+4] for x in xrange(2, len(devid), 4)]
+				devid = '.'.join(mac_seg)
+			except:
+				pass
+
+			if (rimg != None):
+				rimg = self._format_ios_ver(rimg)
 
-				t = name.prettyPrint().split('.')
-				ifidx = t[12]
-				ifidx2 = t[13]
-
-				rip = ''
-				for r in self.lldp_vbtbl:
-					for	n, v in r:
-						if (n.prettyPrint().startswith(OID_LLDP_DEVADDR + '.' + ifidx + '.' + ifidx2)):
-							t2 = n.prettyPrint().split('.')
-							rip = '.'.join(t2[16:])
-
-
-				lport = self._get_ifname(ifidx)
-
-				rport = snmpobj.cache_lookup(self.lldp_vbtbl, OID_LLDP_DEVPORT + '.' + ifidx + '.' + ifidx2)
-				rport = shorten_port_name(rport)
-
-				devid = snmpobj.cache_lookup(self.lldp_vbtbl, OID_LLDP_DEVID + '.' + ifidx + '.' + ifidx2)
-				try:
-					mac_seg = [devid[x:x+4] for x in xrange(2, len(devid), 4)]
-					devid = '.'.join(mac_seg)
-				except:
-					pass
-
-				rimg = snmpobj.cache_lookup(self.lldp_vbtbl, OID_LLDP_DEVDESC + '.' + ifidx + '.' + ifidx2)
-				if (rimg != None):
-					try:
-						rimg = binascii.unhexlify(rimg[2:])
-					except:
-						pass
-					rimg = self._format_ios_ver(rimg)
-
-				name = snmpobj.cache_lookup(self.lldp_vbtbl, OID_LLDP_DEVNAME + '.' + ifidx + '.' + ifidx2)
-				if ((name == None) | (name == '')):
-					name = devid
-
-				link                  = self._get_node_link_info(ifidx, ifidx2)
-				link.remote_ip        = rip
-				link.remote_name      = name
-				link.discovered_proto = 'lldp'
-				link.local_port       = lport
-				link.remote_port      = rport
-				link.remote_plat      = None
-				link.remote_ios       = rimg
-				link.remote_mac       = devid
-
-				neighbors.append(link)
+			name = pretty_val(name)
+			if ((name == None) | (name == '')):
+				name = devid
+
+			link                  = self._get_node_link_info(ifidx, ifidx2)
+			link.remote_ip        = rip
+			link.remote_name      = name
+			link.discovered_proto = 'lldp'
+			link.local_port       = lport
+			link.remote_port      = rport
+			link.remote_ios       = rimg
+			link.remote_mac       = devid
+
+			neighbors.append(link)
 
 		return neighbors
 
 
+	#
+	# Management addresses of the LLDP neighbors by (local port,
+	# remote index), decoded once from the lldpRemManAddrTable index.
+	# IPv4 addresses are listed before IPv6 ones.
+	#
+	def _get_lldp_man_addrs(self):
+		addrs = {}
+		for (idx, v) in self.lldp_vbtbl.column(OID_LLDP_DEVADDR):
+			# local port, remote index, address family, length, address
+			if (len(idx) < 4):
+				continue
+			addr = inet_address_str(idx[2], idx[4:4+idx[3]])
+			if (addr == None):
+				continue
+			addrs.setdefault(idx[:2], []).append((idx[2], addr))
+
+		for key in addrs:
+			addrs[key] = [addr for (family, addr) in sorted(addrs[key], key = lambda a: a[0])]
+
+		return addrs
+
+
 	def _get_node_link_info(self, ifidx, ifidx2):
 		snmpobj = self.snmpobj
 
@@ -668,12 +803,10 @@ class mnet_node:
 		link_type = snmpobj.cache_lookup(self.link_type_vbtbl, OID_TRUNK_VTP + '.' + ifidx)
 
 		native_vlan = None
-		allowed_vlans = 'All'
+		allowed_vlans = VLANS_ALL
 		if (link_type == '1'):
 			native_vlan = snmpobj.cache_lookup(self.trk_native_vbtbl, OID_TRUNK_NATIVE + '.' + ifidx)
-
-			allowed_vlans = snmpobj.cache_lookup(self.trk_allowed_vbtbl, OID_TRUNK_ALLOW + '.' + ifidx)
-			allowed_vlans = self._parse_allowed_vlans(allowed_vlans)
+			allowed_vlans = self._get_allowed_vlans(ifidx)
 
 		# get LAG membership
 		lag = snmpobj.cache_lookup(self.lag_vbtbl, OID_LAG_LACP + '.' + ifidx)
@@ -687,9 +820,9 @@ class mnet_node:
 		lifips = self._get_cidrs_from_ifidx(ifidx)
 
 		link = mnet_node_link(remote_ip         = None,
-							link_type           = link_type,
-							vlan                = vlan,
-							local_native_vlan   = native_vlan,
+							link_type           = intern_str(link_type),
+							vlan                = intern_str(vlan),
+							local_native_vlan   = intern_str(native_vlan),
 							local_allowed_vlans = allowed_vlans,
 							local_port          = None,
 							remote_port         = None,
@@ -706,51 +839,29 @@ class mnet_node:
 		return link
 
 
-	def _parse_allowed_vlans(self, allowed_vlans):
-		if (allowed_vlans.startswith('0x') == False):
-			return 'All'
-	
-		ret = ''
-		group = 0
-		op = 0
-
-		for i in range(2, len(allowed_vlans)):
-			v = int(allowed_vlans[i], 16)
-			for b in range(0, 4):
-				a = v & (0x1 << (3 - b))
-				vlan = ((i-2)*4)+b
-
-				if (a):
-					if (op == 1):
-						group += 1
-					else:
-						if (len(ret)):
-							if (group > 1):
-								ret += '-'
-								ret += str(vlan - 1) if vlan else '1'
-							else:
-								ret += ',%i' % vlan
-						else:
-							ret += str(vlan)
-						group = 0
-						op = 1
-				else:
-					if (op == 1):
-						if (len(ret)):
-							if (group > 1):
-								ret += '-%i' % (vlan - 1)
-						op = 0
-					group = 0
-
-		if (op):
-			if (ret == '1'):
-				return 'All'
-			if (group):
-				ret += '-1001'
-			else:
-				ret += ',1001'
-
-		return ret if len(ret) else 'All'
+	#
+	# VLANs allowed on a trunk, from its 1k to 4k bitmaps.
+	#
+	def _get_allowed_vlans(self, ifidx):
+		if (self.trk_allowed_vbtbl == None):
+			return VLANS_ALL
+
+		bitmaps = [self.trk_allowed_vbtbl.instance(oid, ifidx) for oid in TRUNK_ALLOW_OIDS]
+
+		return mnet_vlan_set.from_octets(bitmaps)
+
+
+	#
+	# Walk the ENTITY-MIB columns used by _get_chassis_info().
+	# Safe to call from another thread ahead of query_node().
+	#
+	def fetch_chassis_info(self):
+		self.chassis_vbtbl = self.snmpobj.get_columns([
+					OID_ENTPHYENTRY_CLASS,
+					OID_ENTPHYENTRY_SERIAL,
+					OID_ENTPHYENTRY_PLAT,
+					OID_ENTPHYENTRY_SOFTWARE
+				])
 
 
 	def _get_chassis_info(self):
@@ -768,40 +879,35 @@ class mnet_node:
 			# for this.
 			return
 
-		class_vbtbl  = snmpobj.get_bulk(OID_ENTPHYENTRY_CLASS)
-		serial_vbtbl = snmpobj.get_bulk(OID_ENTPHYENTRY_SERIAL)
-		platf_vbtbl  = snmpobj.get_bulk(OID_ENTPHYENTRY_PLAT)
-		ios_vbtbl    = snmpobj.get_bulk(OID_ENTPHYENTRY_SOFTWARE)
+		if (self.chassis_vbtbl == None):
+			self.fetch_chassis_info()
+
+		# only needed once
+		vbtbl = self.chassis_vbtbl
+		self.chassis_vbtbl = None
 
-		if (class_vbtbl == None):
+		if (vbtbl == None):
 			return
 
-		for row in class_vbtbl:
-			for n, v in row:
-				if (v != ENTPHYCLASS_CHASSIS):
-					continue
+		for (cidx, v) in vbtbl.column(OID_ENTPHYENTRY_CLASS):
+			if (v != ENTPHYCLASS_CHASSIS):
+				continue
 
-				t = n.prettyPrint().split('.')
-				idx = t[12]
+			idx = str(cidx[0])
 
-				self.serial = snmpobj.cache_lookup(serial_vbtbl, OID_ENTPHYENTRY_SERIAL + '.' + idx)
-				self.plat   = snmpobj.cache_lookup(platf_vbtbl, OID_ENTPHYENTRY_PLAT + '.' + idx)
-				self.ios    = snmpobj.cache_lookup(ios_vbtbl, OID_ENTPHYENTRY_SOFTWARE + '.' + idx)
+			self.serial = snmpobj.cache_lookup(vbtbl, OID_ENTPHYENTRY_SERIAL + '.' + idx)
+			self.plat   = intern_str(snmpobj.cache_lookup(vbtbl, OID_ENTPHYENTRY_PLAT + '.' + idx))
+			self.ios    = snmpobj.cache_lookup(vbtbl, OID_ENTPHYENTRY_SOFTWARE + '.' + idx)
 
 		# modular switches might have IOS on a module rather than chassis
 		if (self.ios == ''):
-			for row in class_vbtbl:
-				for n, v in row:
-					if (v != ENTPHYCLASS_MODULE):
-						continue
-
-					t = n.prettyPrint().split('.')
-					idx = t[12]
+			for (cidx, v) in vbtbl.column(OID_ENTPHYENTRY_CLASS):
+				if (v != ENTPHYCLASS_MODULE):
+					continue
 
-					self.ios = snmpobj.cache_lookup(ios_vbtbl, OID_ENTPHYENTRY_SOFTWARE + '.' + idx)
-					if (self.ios != ''):
-						break
+				idx = str(cidx[0])
 
+				self.ios = snmpobj.cache_lookup(vbtbl, OID_ENTPHYENTRY_SOFTWARE + '.' + idx)
 				if (self.ios != ''):
 					break
 		self.ios = self._format_ios_ver(self.ios)
@@ -822,15 +928,19 @@ class mnet_node:
 
 
 	def _get_system_name(self, domains):
-		return shorten_host_name(self.snmpobj.get_val(OID_SYSNAME), domains)
+		# the credential probe usually got it already
+		name = self.snmpobj.sys_name
+		if (name == None):
+			name = self.snmpobj.get_val(OID_SYSNAME)
+		return shorten_host_name(name, domains)
 
 
 	def _format_ios_ver(self, img):
 		img_s = re.search('(Version:? |CCM:)([^ ,$]*)', img)
 		if (img_s):
 			if (img_s.group(1) == 'CCM:'):
-				return 'CCM %s' % img_s.group(2)
-			return img_s.group(2)
+				return intern_str('CCM %s' % img_s.group(2))
+			return intern_str(img_s.group(2))
 
-		return img
+		return intern_str(img)
 
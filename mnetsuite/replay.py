@@ -0,0 +1,523 @@
+#!/usr/bin/python
+
+'''
+	MNet Suite
+	replay.py
+
+	Michael Laforest
+	mjlaforest@gmail.com
+
+	Copyright (C) 2015 Michael Laforest
+
+	This program is free software; you can redistribute it and/or
+	modify it under the terms of the GNU General Public License
+	as published by the Free Software Foundation; either version 2
+	of the License, or (at your option) any later version.
+
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License
+	along with this program; if not, write to the Free Software
+	Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+'''
+
+import os
+import time
+import heapq
+import random
+import bisect
+import binascii
+import threading
+import asyncore
+import socket
+import Queue
+
+from pysnmp.proto import rfc1902, rfc1905
+from pysnmp.proto.api import v2c
+from pyasn1.codec.ber import encoder, decoder
+
+from snmp import *
+
+#
+# Recordings are kept one file per device in snmprec format,
+# one 'OID|type|value' line per object, sorted by OID.
+# Octet strings are hex encoded ('4x').  Files are named after the
+# agent IP, with the community '@context' appended for the
+# per-VLAN bridge tables tracemac reads.
+#
+SNMPREC_EXT = '.snmprec'
+
+SNMPREC_TYPES = [
+	(2,		rfc1902.Integer),
+	(4,		rfc1902.OctetString),
+	(5,		rfc1902.Null),
+	(6,		rfc1902.ObjectIdentifier),
+	(64,	rfc1902.IpAddress),
+	(65,	rfc1902.Counter32),
+	(66,	rfc1902.Gauge32),
+	(67,	rfc1902.TimeTicks),
+	(68,	rfc1902.Opaque),
+	(70,	rfc1902.Counter64)
+]
+
+# octet strings written in hex
+SNMPREC_HEX_TYPES = [4, 64, 68]
+
+SNMP_TIMEOUT_ERR = 'No SNMP response received before timeout'
+
+
+#
+# Split a community into the part agents check and the
+# '@context' suffix, e.g. 'public@10' -> '@10'.
+#
+def community_context(community):
+	i = community.find('@')
+	if (i < 0):
+		return ''
+	return community[i:]
+
+
+def snmprec_encode(oid, v):
+	for tag, cls in SNMPREC_TYPES:
+		if (v.tagSet == cls.tagSet):
+			break
+	else:
+		return None
+
+	oid = '.'.join([str(x) for x in oid])
+
+	if (tag in SNMPREC_HEX_TYPES):
+		return '%s|%dx|%s' % (oid, tag, binascii.hexlify(v.asOctets()))
+	if (tag == 5):
+		return '%s|5|' % oid
+	if (tag == 6):
+		return '%s|6|%s' % (oid, '.'.join([str(x) for x in v]))
+
+	return '%s|%d|%d' % (oid, tag, int(v))
+
+
+def snmprec_decode(line):
+	oid, tag, val = line.rstrip('\r\n').split('|', 2)
+
+	if (tag.endswith('x')):
+		tag = int(tag[:-1])
+		val = binascii.unhexlify(val)
+	else:
+		tag = int(tag)
+
+	cls = dict(SNMPREC_TYPES)[tag]
+	if (tag in SNMPREC_HEX_TYPES):
+		v = cls(val)
+	elif (tag == 5):
+		v = cls('')
+	elif (tag == 6):
+		v = cls(val)
+	else:
+		v = cls(int(val))
+
+	return oid_to_tuple(oid), v
+
+
+class mnet_snmp_recording:
+	'''
+	The objects recorded from one agent, sorted by OID so
+	GETNEXT and GETBULK can be answered from it.
+	'''
+	def __init__(self, vals = None):
+		self.vals = {}
+		if (vals != None):
+			self.vals = vals
+		self.oids = sorted(self.vals)
+
+	def add(self, oid, v):
+		oid = oid_to_tuple(oid)
+		if (oid not in self.vals):
+			bisect.insort(self.oids, oid)
+		self.vals[oid] = v
+
+	def get(self, oid):
+		return self.vals.get(oid_to_tuple(oid))
+
+	#
+	# First (OID, value) after oid, or None at the end of the MIB.
+	#
+	def next(self, oid):
+		i = bisect.bisect_right(self.oids, oid_to_tuple(oid))
+		if (i >= len(self.oids)):
+			return None
+		return self.oids[i], self.vals[self.oids[i]]
+
+	def load(self, filename):
+		for line in open(filename):
+			if ((line.strip() == '') | line.startswith('#')):
+				continue
+			oid, v = snmprec_decode(line)
+			self.oids.append(oid)
+			self.vals[oid] = v
+		self.oids.sort()
+
+	def save(self, filename):
+		f = open(filename, 'w')
+		for oid in self.oids:
+			line = snmprec_encode(oid, self.vals[oid])
+			if (line != None):
+				f.write(line + '\n')
+		f.close()
+
+	#
+	# Answer a GETBULK with max_rep rows for oids.
+	#
+	def bulk(self, oids, max_rep):
+		table = []
+		for r in xrange(0, max_rep):
+			row = []
+			for i in xrange(0, len(oids)):
+				nxt = self.next(oids[i])
+				if (nxt == None):
+					row.append((rfc1902.ObjectName(oids[i]), rfc1905.endOfMibView))
+				else:
+					oids[i] = nxt[0]
+					row.append((rfc1902.ObjectName(nxt[0]), nxt[1]))
+			table.append(row)
+			if (len([1 for n, v in row if (v.tagSet != rfc1905.EndOfMibView.tagSet)]) == 0):
+				break
+		return table
+
+
+#
+# Load a directory of recordings.
+# Returns a dict of (agent IP, '@context') -> mnet_snmp_recording.
+#
+def load_recordings(path):
+	recs = {}
+	for fn in os.listdir(path):
+		if (fn.endswith(SNMPREC_EXT) == False):
+			continue
+		name = fn[:-len(SNMPREC_EXT)]
+		i = name.find('@')
+		if (i < 0):
+			key = (name, '')
+		else:
+			key = (name[:i], name[i:])
+		rec = mnet_snmp_recording()
+		rec.load(os.path.join(path, fn))
+		recs[key] = rec
+	return recs
+
+
+class mnet_snmp_recorder:
+	'''
+	Keeps every answer the SNMP engine gets so a crawl can
+	be replayed later.  Set it as the engine's recorder, then
+	save() to a directory at the end.
+	'''
+	def __init__(self):
+		self.recordings = {}
+		self._lock = threading.Lock()
+
+	#
+	# Wrap a request callback so the answer is recorded first.
+	# table is True for walks, which return rows of varbinds.
+	#
+	def wrap(self, ip, community, cb, table):
+		def record(req):
+			if ((req.err_indication == None) & (req.err_status == 0)):
+				if (table):
+					for row in req.var_binds:
+						self.add(ip, community, row)
+				else:
+					self.add(ip, community, req.var_binds)
+			if (cb != None):
+				cb(req)
+		return record
+
+	def add(self, ip, community, var_binds):
+		key = (ip, community_context(community))
+
+		with self._lock:
+			rec = self.recordings.get(key)
+			if (rec == None):
+				rec = mnet_snmp_recording()
+				self.recordings[key] = rec
+
+			for n, v in var_binds:
+				if ((v.tagSet == rfc1905.NoSuchObject.tagSet) |
+						(v.tagSet == rfc1905.NoSuchInstance.tagSet) |
+						(v.tagSet == rfc1905.EndOfMibView.tagSet)):
+					continue
+				rec.add(tuple(n), v)
+
+	def save(self, path):
+		if (os.path.isdir(path) == False):
+			os.makedirs(path)
+
+		with self._lock:
+			for (ip, context), rec in self.recordings.items():
+				rec.save(os.path.join(path, ip + context + SNMPREC_EXT))
+
+
+class _mnet_replay_target:
+	def __init__(self, ip, timeout, retries):
+		self.ip = ip
+		self.timeout = timeout
+		self.retries = retries
+
+
+class mnet_snmp_replay_engine(mnet_snmp_engine):
+	'''
+	SNMP engine that answers from recordings instead of the network.
+
+	Requests go through the same walker and callbacks as the real
+	engine.  Each request and retry is lost with probability loss,
+	costing its timeout, and answers arrive after latency seconds.
+	Agents without a recording never answer.
+
+	requests counts the PDUs that would have been sent.
+	'''
+	def __init__(self, recordings, latency = 0, loss = 0, seed = None):
+		self.recordings = recordings
+		self.latency = latency
+		self.loss = loss
+		self.requests = 0
+		self._random = random.Random(seed)
+		self._timers = []
+		self._seq = 0
+
+		mnet_snmp_engine.__init__(self)
+
+	def _get_target(self, req, ip, timeout, retries):
+		return _mnet_replay_target(ip, timeout, retries)
+
+	def _send_get(self, req, auth, target, oids):
+		rec = self.recordings.get((target.ip, community_context(str(auth.communityName))))
+
+		var_binds = []
+		if (rec != None):
+			for oid in oids:
+				v = rec.get(oid)
+				if (v == None):
+					v = rfc1905.noSuchObject
+				var_binds.append((rfc1902.ObjectName(oid_to_tuple(oid)), v))
+
+		self._answer(rec, target, self._cb_get, var_binds, req)
+
+	def _send_bulk(self, auth, target, max_rep, oids, ctx):
+		rec = self.recordings.get((target.ip, community_context(str(auth.communityName))))
+
+		table = []
+		if (rec != None):
+			table = rec.bulk([oid_to_tuple(o) for o in oids], max_rep)
+
+		self._answer(rec, target, self._cb_walk, table, ctx)
+
+	#
+	# Schedule the answer, or the timeout, of one request.
+	#
+	def _answer(self, rec, target, cb, var_binds, ctx):
+		delay = 0
+		for attempt in xrange(0, target.retries + 1):
+			self.requests += 1
+			if ((rec != None) & (self._random.random() >= self.loss)):
+				self._schedule(delay + self.latency, cb, (None, None, 0, 0, var_binds, ctx))
+				return
+			delay += target.timeout
+
+		self._schedule(delay, cb, (None, SNMP_TIMEOUT_ERR, 0, 0, [], ctx))
+
+	def _schedule(self, delay, func, args):
+		self._seq += 1
+		heapq.heappush(self._timers, (time.time() + delay, self._seq, func, args))
+
+	#
+	# Engine thread.
+	# Sends queued requests and fires answers as they come due.
+	#
+	def _run(self):
+		while True:
+			timeout = None
+			if (len(self._timers) > 0):
+				timeout = max(0, self._timers[0][0] - time.time())
+
+			try:
+				if (timeout == 0):
+					item = self._queue.get(False)
+				else:
+					item = self._queue.get(True, timeout)
+			except Queue.Empty:
+				item = None
+
+			if (item != None):
+				func, req, args = item
+				try:
+					func(req, *args)
+				except Exception as e:
+					req._complete(str(e))
+
+			now = time.time()
+			while ((len(self._timers) > 0) and (self._timers[0][0] <= now)):
+				due, seq, func, args = heapq.heappop(self._timers)
+				try:
+					func(*args)
+				except Exception as e:
+					print('[E] replay: %s' % e)
+
+
+class _mnet_replay_agent(asyncore.dispatcher):
+	'''
+	One recorded agent on a local UDP port.
+	'''
+	def __init__(self, responder, rec, host, sock_map):
+		asyncore.dispatcher.__init__(self, map = sock_map)
+		self.create_socket(socket.AF_INET, socket.SOCK_DGRAM)
+		self.bind((host, 0))
+		self.addr = self.socket.getsockname()
+		self._responder = responder
+		self._rec = rec
+
+	def handle_read(self):
+		try:
+			msg, addr = self.recvfrom(65535)
+		except socket.error:
+			return
+
+		rsp = self._responder._handle(self._rec, msg)
+		if (rsp != None):
+			self._responder._send_later(self, rsp, addr)
+
+	def writable(self):
+		return False
+
+	def handle_connect(self):
+		pass
+
+
+class mnet_snmp_responder:
+	'''
+	Serves recordings as SNMPv2c agents on local UDP ports,
+	one port per recorded agent, so a crawl can run against
+	them through the real network stack.
+
+	Any community is accepted; its '@context' picks the recording.
+	Requests are dropped with probability loss and answered after
+	latency seconds.
+	'''
+	def __init__(self, recordings, host = '127.0.0.1', latency = 0, loss = 0, seed = None):
+		self.latency = latency
+		self.loss = loss
+		self.requests = 0
+		self._random = random.Random(seed)
+		self._map = {}
+		self._pending = []
+		self._seq = 0
+		self._lock = threading.Lock()
+
+		# agent IP -> (host, port)
+		self.addrs = {}
+
+		self._contexts = {}
+		for (ip, context), rec in recordings.items():
+			self._contexts.setdefault(ip, {})[context] = rec
+
+		for ip, recs in self._contexts.items():
+			agent = _mnet_replay_agent(self, recs, host, self._map)
+			self.addrs[ip] = agent.addr
+
+		self._thread = threading.Thread(target = self._run, name = 'mnet-snmp-responder')
+		self._thread.daemon = True
+		self._thread.start()
+
+	#
+	# Point an engine at these agents instead of the real ones.
+	#
+	def redirect(self, engine):
+		for ip, addr in self.addrs.items():
+			engine.redirect(ip, addr)
+
+	def _handle(self, recs, msg):
+		try:
+			req, rest = decoder.decode(msg, asn1Spec = v2c.Message())
+		except Exception:
+			return None
+
+		with self._lock:
+			self.requests += 1
+			if (self._random.random() < self.loss):
+				return None
+
+		rec = recs.get(community_context(str(v2c.apiMessage.getCommunity(req))))
+		if (rec == None):
+			return None
+
+		pdu = v2c.apiMessage.getPDU(req)
+		rsp = v2c.apiMessage.getResponse(req)
+		rsp_pdu = v2c.apiMessage.getPDU(rsp)
+		oids = [tuple(n) for n, v in v2c.apiPDU.getVarBinds(pdu)]
+
+		if (pdu.isSameTypeWith(v2c.GetRequestPDU())):
+			var_binds = []
+			for oid in oids:
+				v = rec.get(oid)
+				if (v == None):
+					v = rfc1905.noSuchObject
+				var_binds.append((oid, v))
+		elif (pdu.isSameTypeWith(v2c.GetNextRequestPDU())):
+			var_binds = []
+			for row in rec.bulk(oids, 1):
+				var_binds.extend(row)
+		elif (pdu.isSameTypeWith(v2c.GetBulkRequestPDU())):
+			non_rep = min(int(v2c.apiBulkPDU.getNonRepeaters(pdu)), len(oids))
+			max_rep = int(v2c.apiBulkPDU.getMaxRepetitions(pdu))
+			var_binds = []
+			if (non_rep > 0):
+				var_binds.extend(rec.bulk(oids[:non_rep], 1)[0])
+			if ((len(oids) > non_rep) & (max_rep > 0)):
+				for row in rec.bulk(oids[non_rep:], max_rep):
+					var_binds.extend(row)
+		else:
+			return None
+
+		v2c.apiPDU.setVarBinds(rsp_pdu, var_binds)
+		return encoder.encode(rsp)
+
+	def _send_later(self, agent, rsp, addr):
+		if (self.latency <= 0):
+			agent.socket.sendto(rsp, addr)
+			return
+
+		self._seq += 1
+		heapq.heappush(self._pending, (time.time() + self.latency, self._seq, agent, rsp, addr))
+
+	def _run(self):
+		while True:
+			timeout = 0.05
+			if (len(self._pending) > 0):
+				timeout = max(0, min(timeout, self._pending[0][0] - time.time()))
+
+			asyncore.loop(timeout, use_poll = True, map = self._map, count = 1)
+
+			now = time.time()
+			while ((len(self._pending) > 0) and (self._pending[0][0] <= now)):
+				due, seq, agent, rsp, addr = heapq.heappop(self._pending)
+				agent.socket.sendto(rsp, addr)
+
+
+#
+# Record every SNMP answer from now on.
+# Returns the mnet_snmp_recorder; save() it when done.
+#
+def start_recording():
+	recorder = mnet_snmp_recorder()
+	get_snmp_engine().recorder = recorder
+	return recorder
+
+#
+# Answer all SNMP from the recordings in path from now on.
+# Returns the mnet_snmp_replay_engine.
+#
+def start_replay(path, latency = 0, loss = 0):
+	engine = mnet_snmp_replay_engine(load_recordings(path), latency, loss)
+	set_snmp_engine(engine)
+	return engine
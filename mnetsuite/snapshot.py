@@ -0,0 +1,278 @@
+#!/usr/bin/python
+
+'''
+	MNet Suite
+	snapshot.py
+
+	Michael Laforest
+	mjlaforest@gmail.com
+
+	Copyright (C) 2015 Michael Laforest
+
+	This program is free software; you can redistribute it and/or
+	modify it under the terms of the GNU General Public License
+	as published by the Free Software Foundation; either version 2
+	of the License, or (at your option) any later version.
+
+	This program is distributed in the hope that it will be useful,
+	but WITHOUT ANY WARRANTY; without even the implied warranty of
+	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+	GNU General Public License for more details.
+
+	You should have received a copy of the GNU General Public License
+	along with this program; if not, write to the Free Software
+	Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+'''
+
+#
+# Crawled topology saved to a file, so the outputs can be
+# produced again without crawling.
+#
+# The file is JSON, one record per line.  The first line is
+# the header, then one line per node in crawl order:
+#
+#   {"format": "mnet-snapshot", "version": 1, "root": <node line>,
+#    "node": [<NODE_FIELDS>], "link": [<LINK_FIELDS>], ...}
+#   {"n": [<node fields>], "snmp": 1,
+#    "svi": [[vlan, [ips]]], "lo": [[name, [ips]]],
+#    "stack": [count, [[<STACK_MEMBER_FIELDS>]]],
+#    "vss": [enabled, domain, [[<VSS_MEMBER_FIELDS>]]],
+#    "links": [[peer node line, <link fields>]],
+#    "nbr": [[<link fields>]]}
+#
+# "nbr" are the CDP and LLDP neighbors as read from the device,
+# which an incremental crawl reuses if the device did not change.
+# "options" in the header are the graph options the nodes were
+# queried with.
+#
+# Field values are listed in the order given by the header, so
+# fields can be added without breaking older snapshots.
+# Strings are kept byte for byte by treating them as latin-1.
+#
+
+import json
+import time
+
+from node import *
+from _version import __version__
+
+SNAPSHOT_FORMAT = 'mnet-snapshot'
+SNAPSHOT_VERSION = 1
+
+NODE_FIELDS = [
+	'name', 'ip', 'plat', 'ios', 'router', 'ospf_id', 'bgp_las',
+	'hsrp_pri', 'hsrp_vip', 'serial', 'bootfile',
+	'sys_uptime', 'cdp_last_change', 'lldp_last_change'
+]
+
+LINK_FIELDS = [
+	'link_type', 'remote_ip', 'remote_name', 'vlan',
+	'local_native_vlan', 'local_allowed_vlans',
+	'remote_native_vlan', 'remote_allowed_vlans',
+	'local_port', 'remote_port', 'local_lag', 'remote_lag',
+	'local_lag_ips', 'remote_lag_ips', 'local_if_ip', 'remote_if_ip',
+	'remote_platform', 'remote_ios', 'remote_mac', 'discovered_proto'
+]
+
+# kept as str() of a mnet_vlan_set
+VLAN_SET_FIELDS = ['local_allowed_vlans', 'remote_allowed_vlans']
+
+STACK_MEMBER_FIELDS = ['num', 'role', 'pri', 'mac', 'img', 'serial', 'plat']
+
+VSS_MEMBER_FIELDS = ['ios', 'serial', 'plat']
+
+SNAPSHOT_ENCODING = 'latin-1'
+
+
+#
+# Values that aren't plain JSON, like VLAN sets.
+#
+def _json_default(v):
+	return str(v)
+
+
+#
+# Undo the unicode json.loads() returns.
+#
+def _from_json(v):
+	if (isinstance(v, unicode)):
+		return v.encode(SNAPSHOT_ENCODING)
+	if (isinstance(v, list)):
+		return [_from_json(x) for x in v]
+	return v
+
+
+def _get_fields(obj, fields):
+	return [getattr(obj, f) for f in fields]
+
+
+#
+# Fields this version doesn't know are skipped, the
+# objects only have slots for their own.
+#
+def _set_fields(obj, fields, vals):
+	for f, v in zip(fields, vals):
+		if (hasattr(obj, f) == False):
+			continue
+		v = _from_json(v)
+		if ((f in VLAN_SET_FIELDS) & isinstance(v, str)):
+			v = mnet_vlan_set.from_str(v)
+		setattr(obj, f, v)
+
+
+def _node_record(node, node_idx):
+	rec = {}
+	rec['n'] = _get_fields(node, NODE_FIELDS)
+	rec['snmp'] = node.snmpobj.success
+	rec['svi'] = [[svi.vlan, svi.ip] for svi in node.svis]
+	rec['lo'] = [[lo.name, lo.ips] for lo in node.loopbacks]
+	rec['stack'] = [node.stack.count,
+					[_get_fields(m, STACK_MEMBER_FIELDS) for m in node.stack.members]]
+	rec['vss'] = [node.vss.enabled, node.vss.domain,
+					[_get_fields(m, VSS_MEMBER_FIELDS) for m in node.vss.members]]
+	rec['links'] = [[node_idx.get(link.node)] + _get_fields(link, LINK_FIELDS) for link in node.links]
+	if (node.neighbors != None):
+		rec['nbr'] = [_get_fields(n, LINK_FIELDS) for n in node.neighbors]
+
+	return rec
+
+
+#
+# Build a node from its record.
+# Links are returned as (peer node line, link) to be resolved
+# once every node is loaded.
+#
+def _load_node(rec, fields):
+	node = mnet_node()
+	_set_fields(node, fields['node'], rec['n'])
+	node.snmpobj.success = rec.get('snmp', 0)
+
+	for vlan, ips in rec.get('svi', []):
+		svi = mnet_node_svi(_from_json(vlan))
+		svi.ip = _from_json(ips)
+		node.svis.append(svi)
+
+	for name, ips in rec.get('lo', []):
+		node.loopbacks.append(mnet_node_lo(_from_json(name), _from_json(ips)))
+
+	count, members = rec.get('stack', [0, []])
+	node.stack.count = count
+	for vals in members:
+		m = mnet_node_stack_member()
+		_set_fields(m, fields['stack_member'], vals)
+		node.stack.members.append(m)
+
+	enabled, domain, members = rec.get('vss', [0, None, []])
+	node.vss.enabled = enabled
+	node.vss.domain = _from_json(domain)
+	for m, vals in zip(node.vss.members, members):
+		_set_fields(m, fields['vss_member'], vals)
+
+	links = []
+	for vals in rec.get('links', []):
+		link = mnet_node_link()
+		_set_fields(link, fields['link'], vals[1:])
+		links.append((vals[0], link))
+
+	nbr = rec.get('nbr')
+	if (nbr != None):
+		node.neighbors = []
+		for vals in nbr:
+			n = mnet_node_link()
+			_set_fields(n, fields['link'], vals)
+			node.neighbors.append(n)
+
+	return node, links
+
+
+#
+# Write the nodes to a snapshot file.
+# Returns 1 on success.
+#
+def save_snapshot(filename, nodes, root_node, options = None):
+	node_idx = {}
+	for i, node in enumerate(nodes):
+		node_idx[node] = i
+
+	header = {
+		'format': SNAPSHOT_FORMAT,
+		'version': SNAPSHOT_VERSION,
+		'mnet': __version__,
+		'created': int(time.time()),
+		'root': node_idx.get(root_node),
+		'count': len(nodes),
+		'options': options,
+		'node': NODE_FIELDS,
+		'link': LINK_FIELDS,
+		'stack_member': STACK_MEMBER_FIELDS,
+		'vss_member': VSS_MEMBER_FIELDS
+	}
+
+	try:
+		f = open(filename, 'w')
+	except IOError as e:
+		print('[E] Unable to write snapshot %s: %s' % (filename, e))
+		return 0
+
+	encoder = json.JSONEncoder(encoding = SNAPSHOT_ENCODING, default = _json_default, separators = (',', ':'), sort_keys = True)
+
+	f.write(encoder.encode(header) + '\n')
+	for node in nodes:
+		f.write(encoder.encode(_node_record(node, node_idx)) + '\n')
+	f.close()
+
+	return 1
+
+
+#
+# Read a snapshot file.
+# Returns (nodes, root node, options), or None if it can't be read.
+#
+def load_snapshot(filename):
+	try:
+		f = open(filename)
+	except IOError as e:
+		print('[E] Unable to read snapshot %s: %s' % (filename, e))
+		return None
+
+	try:
+		header = json.loads(f.readline())
+	except ValueError:
+		header = None
+
+	if ((isinstance(header, dict) == False) or (header.get('format') != SNAPSHOT_FORMAT)):
+		print('[E] %s is not an MNet snapshot.' % filename)
+		f.close()
+		return None
+
+	if (header.get('version', 0) > SNAPSHOT_VERSION):
+		print('[E] Snapshot %s is version %s, only up to %i is supported.' % (filename, header.get('version'), SNAPSHOT_VERSION))
+		f.close()
+		return None
+
+	fields = {
+		'node': header.get('node', NODE_FIELDS),
+		'link': header.get('link', LINK_FIELDS),
+		'stack_member': header.get('stack_member', STACK_MEMBER_FIELDS),
+		'vss_member': header.get('vss_member', VSS_MEMBER_FIELDS)
+	}
+
+	nodes = []
+	links = []
+	for line in f:
+		node, node_links = _load_node(json.loads(line), fields)
+		nodes.append(node)
+		links.append(node_links)
+	f.close()
+
+	for node, node_links in zip(nodes, links):
+		for peer, link in node_links:
+			if (peer != None):
+				link.node = nodes[peer]
+			node.links.append(link)
+
+	root = header.get('root')
+	if (root != None):
+		root = nodes[root]
+
+	return (nodes, root, header.get('options'))
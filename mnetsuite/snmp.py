@@ -24,11 +24,21 @@
 	Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 '''
 
+import threading
+import Queue
+import asyncore
+import socket
+import time
+import re
+import binascii
+
 from pysnmp.entity.rfc3413.oneliner import cmdgen
+from pysnmp.proto import rfc1902, rfc1905
 
 SNMP_PORT = 161
 
 OID_SYSNAME		= '1.3.6.1.2.1.1.5.0'
+OID_SYS_UPTIME	= '1.3.6.1.2.1.1.3.0'
 
 OID_SYS_SERIAL	= '1.3.6.1.4.1.9.3.6.3.0'
 OID_SYS_BOOT	= '1.3.6.1.4.1.9.2.1.73.0'
@@ -42,6 +52,7 @@ OID_CDP_DEVID	= '1.3.6.1.4.1.9.9.23.1.2.1.1.6'		# + .ifidx.53
 OID_CDP_DEVPORT	= '1.3.6.1.4.1.9.9.23.1.2.1.1.7'
 OID_CDP_DEVPLAT	= '1.3.6.1.4.1.9.9.23.1.2.1.1.8'
 OID_CDP_INT		= '1.3.6.1.4.1.9.9.23.1.1.1.1.'			# 6.ifidx
+OID_CDP_LAST_CHANGE = '1.3.6.1.4.1.9.9.23.1.3.5.0'		# cdpGlobalLastChange
 
 OID_LLDP	     = '1.0.8802.1.1.2.1.4'
 OID_LLDP_TYPE    = '1.0.8802.1.1.2.1.4.1.1.4.0'
@@ -50,8 +61,12 @@ OID_LLDP_DEVPORT = '1.0.8802.1.1.2.1.4.1.1.7.0'
 OID_LLDP_DEVNAME = '1.0.8802.1.1.2.1.4.1.1.9.0'
 OID_LLDP_DEVDESC = '1.0.8802.1.1.2.1.4.1.1.10.0'
 OID_LLDP_DEVADDR = '1.0.8802.1.1.2.1.4.2.1.5.0'
+OID_LLDP_LAST_CHANGE = '1.0.8802.1.1.2.1.2.1.0'			# lldpStatsRemTablesLastChangeTime
 
 OID_TRUNK_ALLOW  = '1.3.6.1.4.1.9.9.46.1.6.1.1.4'		# + ifidx (Allowed VLANs)
+OID_TRUNK_ALLOW_2K = '1.3.6.1.4.1.9.9.46.1.6.1.1.17'	# + ifidx (Allowed VLANs 1024-2047)
+OID_TRUNK_ALLOW_3K = '1.3.6.1.4.1.9.9.46.1.6.1.1.18'	# + ifidx (Allowed VLANs 2048-3071)
+OID_TRUNK_ALLOW_4K = '1.3.6.1.4.1.9.9.46.1.6.1.1.19'	# + ifidx (Allowed VLANs 3072-4095)
 OID_TRUNK_NATIVE = '1.3.6.1.4.1.9.9.46.1.6.1.1.5'		# + ifidx (Native VLAN)
 OID_TRUNK_VTP	 = '1.3.6.1.4.1.9.9.46.1.6.1.1.14'		# + ifidx (VTP Status)
 OID_LAG_LACP	 = '1.2.840.10006.300.43.1.2.1.1.12'	# + ifidx (BULK)
@@ -103,6 +118,20 @@ OID_IFINDEX			= '1.3.6.1.2.1.17.1.4.1.2'
 OID_ERR			= 'No Such Object currently exists at this OID'
 OID_ERR_INST	= 'No Such Instance currently exists at this OID'
 
+SNMP_ERR_TOOBIG	= 1
+
+# timeout/retries of the first credential probe of a host
+# that has not answered us before, and of the normal probe.
+SNMP_PROBE_TIMEOUT	= 0.5
+SNMP_PROBE_RETRIES	= 1
+SNMP_TIMEOUT		= 1
+SNMP_RETRIES		= 5
+
+# GETBULK varbinds per response for an agent we have not walked yet,
+# and the most a walk will grow to.
+BULK_MAX_REP_START	= 10
+BULK_MAX_REP_LIMIT	= 64
+
 # OID_ENTPHYENTRY_CLASS values
 ENTPHYCLASS_OTHER         = 1
 ENTPHYCLASS_UNKNOWN       = 2
@@ -117,107 +146,704 @@ ENTPHYCLASS_PORT          = 10
 ENTPHYCLASS_STACK         = 11
 ENTPHYCLASS_PDU           = 12
 
-class mnet_snmp:
-	success = 0
-	ver = 0
-	v2_community = None
-	_ip = None
+#
+# Convert a dotted OID string to a tuple of ints.
+#
+def oid_to_tuple(oid):
+	if (isinstance(oid, tuple)):
+		return oid
+	return tuple([int(x) for x in oid.strip('.').split('.')])
+
+#
+# SNMP values are decoded once as they are read, see decode_val().
+# ASN.1 tag -> function returning the plain value.
+#
+_decoders = {
+	rfc1902.Integer.tagSet:				int,
+	rfc1902.Counter32.tagSet:			int,
+	rfc1902.Gauge32.tagSet:				int,
+	rfc1902.TimeTicks.tagSet:			int,
+	rfc1902.Counter64.tagSet:			int,
+	rfc1902.OctetString.tagSet:			lambda v: v.asOctets(),
+	rfc1902.Opaque.tagSet:				lambda v: v.asOctets(),
+	rfc1902.IpAddress.tagSet:			lambda v: socket.inet_ntoa(v.asOctets()),
+	rfc1902.ObjectIdentifier.tagSet:	lambda v: v.asTuple(),
+	rfc1902.Null.tagSet:				lambda v: ''
+}
+
+_not_printable = re.compile('[^\x20-\x7e]')
+
+#
+# Plain value of a pysnmp value: integers as int, strings as
+# their octets, IpAddress as 'a.b.c.d' and OIDs as tuples.
+# None for noSuchObject, noSuchInstance and endOfMibView.
+#
+def decode_val(v):
+	dec = _decoders.get(v.tagSet)
+	if (dec == None):
+		return None
+	return dec(v)
+
+#
+# Decode a list of (name, value) varbinds to (OID tuple, value).
+#
+def decode_var_binds(var_binds):
+	return [(n.asTuple(), decode_val(v)) for n, v in var_binds]
+
+#
+# String form of a decoded value, or None.
+# The same as pysnmp's prettyPrint(), strings that are not
+# printable ASCII are given in hex as '0x...'.
+#
+def pretty_val(v):
+	if (v is None):
+		return None
+	if (isinstance(v, str)):
+		if (_not_printable.search(v) == None):
+			return v
+		return '0x' + binascii.hexlify(v)
+	if (isinstance(v, tuple)):
+		return '.'.join([str(x) for x in v])
+	return str(v)
+
+
+class mnet_snmp_request:
+	'''
+	A request queued on the shared SNMP engine.
+	Call wait() to block until the agent answers or the request
+	times out, then read err_indication / err_status / var_binds.
+	'''
+	err_indication	= None
+	err_status		= 0
+	err_index		= 0
+	var_binds		= None
+
+	def __init__(self, cb = None):
+		self.err_indication = None
+		self.err_status = 0
+		self.err_index = 0
+		self.var_binds = []
+		self._cb = cb
+		self._done = threading.Event()
+
+	def _complete(self, err_indication, err_status = 0, err_index = 0):
+		self.err_indication = err_indication
+		self.err_status = err_status
+		self.err_index = err_index
+
+		# runs on the engine thread, keep it short.
+		# called before waiters wake up so it sees the request first.
+		try:
+			if (self._cb != None):
+				self._cb(self)
+		finally:
+			self._done.set()
+
+	def done(self):
+		return self._done.is_set()
+
+	def wait(self):
+		self._done.wait()
+		return self
+
+
+#
+# Wait for all of the requests to finish.
+#
+def wait_all(reqs):
+	for req in reqs:
+		req.wait()
+	return reqs
+
+
+class _mnet_snmp_wakeup(asyncore.dispatcher):
+	'''
+	Loopback UDP socket in the engine's socket map.
+	Sending a datagram to it wakes the engine thread up
+	so new requests go out without waiting for a poll timeout.
+	'''
+	def __init__(self, sock_map):
+		asyncore.dispatcher.__init__(self, map = sock_map)
+		self.create_socket(socket.AF_INET, socket.SOCK_DGRAM)
+		self.bind(('127.0.0.1', 0))
+		self._addr = self.socket.getsockname()
+		self._tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+	def wake(self):
+		self._tx.sendto('w', self._addr)
+
+	def handle_read(self):
+		try:
+			self.recv(512)
+		except socket.error:
+			pass
+
+	def writable(self):
+		return False
+
+	def handle_connect(self):
+		pass
+
+
+class _mnet_snmp_walk:
+	'''
+	State of one walk on the engine.
+	Each column is walked up to the end of its own subtree; columns
+	that are done are left out of the following requests.
+	'''
+	def __init__(self, ip, auth, target, oids, max_rep):
+		self.ip = ip
+		self.auth = auth
+		self.target = target
+		self.oids = [oid_to_tuple(oid) for oid in oids]
+		self.next_oids = list(self.oids)
+		self.active = range(0, len(self.oids))
+		self.max_rep = max_rep
+		self.error = None
+
+
+class mnet_snmp_engine:
+	'''
+	One SNMP engine and transport dispatcher for the whole process.
+
+	Requests may be queued from any thread and return right away.
+	A background thread owns pysnmp, sends the requests and completes
+	them as the agents answer, so many requests to many agents can be
+	outstanding at once.
+	'''
+	def __init__(self):
+		self._cmdgen = cmdgen.AsynCommandGenerator()
+		self._queue = Queue.Queue()
+		self._wakeup = None
+
+		# agent IP -> max-repetitions that worked last,
+		# and the most the agent has been able to answer
+		self._max_rep = {}
+		self._max_rep_cap = {}
+
+		# agent IP -> (host, port) to send to instead
+		self._redirect = {}
+
+		# mnet_snmp_recorder to save the answers to, or None
+		self.recorder = None
+
+		self._thread = threading.Thread(target = self._run, name = 'mnet-snmp')
+		self._thread.daemon = True
+		self._thread.start()
+
+	#
+	# Queue a GET for one or more OIDs.
+	# var_binds is the list of (name, value) returned by the agent.
+	#
+	def get(self, ip, community, oids, timeout = 1, retries = 5, cb = None):
+		if (self.recorder != None):
+			cb = self.recorder.wrap(ip, community, cb, False)
+
+		req = mnet_snmp_request(cb)
+		target = self._get_target(req, ip, timeout, retries)
+		if (target != None):
+			self._queue_request(self._send_get, req, cmdgen.CommunityData(community), target, oids)
+		return req
+
+	#
+	# Queue a GETBULK walk of the subtree at OID, or of several
+	# column OIDs side by side when OID is a list.
+	# var_binds is the list of rows inside the subtrees.
+	#
+	# max_rep is only the starting point; the walk adapts it to the
+	# agent and remembers the result for the next walk of that agent.
+	#
+	def walk(self, ip, community, oid, max_rep = None, timeout = 5, retries = 2, cb = None):
+		if (isinstance(oid, basestring) | isinstance(oid, tuple)):
+			oid = [oid]
+
+		if (self.recorder != None):
+			cb = self.recorder.wrap(ip, community, cb, True)
+
+		req = mnet_snmp_request(cb)
+		target = self._get_target(req, ip, timeout, retries)
+		if (target != None):
+			w = _mnet_snmp_walk(ip, cmdgen.CommunityData(community), target, oid, max_rep)
+			self._queue_request(self._send_walk, req, w)
+		return req
+
+	#
+	# Best max-repetitions found so far for this agent, counted in
+	# varbinds per response.  A walk of several columns divides it
+	# between them.
+	#
+	def get_max_rep(self, ip):
+		return self._max_rep.get(ip, BULK_MAX_REP_START)
+
+	#
+	# Send requests for this agent IP to another address,
+	# like a local mnet_snmp_responder.
+	#
+	def redirect(self, ip, addr):
+		self._redirect[ip] = addr
+
+	def _get_target(self, req, ip, timeout, retries):
+		try:
+			addr = self._redirect.get(ip, (ip, SNMP_PORT))
+			return cmdgen.UdpTransportTarget(addr, timeout = timeout, retries = retries)
+		except Exception as e:
+			req._complete(str(e))
+		return None
+
+	def _queue_request(self, func, req, *args):
+		self._queue.put((func, req, args))
+		if (self._wakeup != None):
+			self._wakeup.wake()
+
+	def _send_get(self, req, auth, target, oids):
+		self._cmdgen.getCmd(
+				auth, target, oids,
+				(self._cb_get, req),
+				lookupNames = False, lookupValues = False
+		)
+
+	def _cb_get(self, handle, err_indication, err_status, err_index, var_binds, req):
+		req.var_binds = var_binds
+		req._complete(err_indication, err_status, err_index)
+
+	def _send_walk(self, req, w):
+		if (w.max_rep == None):
+			w.max_rep = max(1, self.get_max_rep(w.ip) / len(w.active))
+
+		self._send_bulk(w.auth, w.target, w.max_rep, [w.next_oids[c] for c in w.active], (req, w))
+
+	def _send_bulk(self, auth, target, max_rep, oids, ctx):
+		self._cmdgen.bulkCmd(
+				auth, target,
+				0, max_rep,
+				oids,
+				(self._cb_walk, ctx),
+				lookupNames = False, lookupValues = False
+		)
+
+	#
+	# Handle one GETBULK response of a walk.
+	# A column is done as soon as it leaves its subtree; the walk
+	# ends when all of them are.  Otherwise adjusts max-repetitions
+	# and asks for the next block of the columns still going.
+	# Always returns False so pysnmp does not continue on its own.
+	#
+	def _cb_walk(self, handle, err_indication, err_status, err_index, var_bind_table, ctx):
+		req, w = ctx
+		ncols = len(w.active)
+
+		if (err_indication):
+			req._complete(err_indication)
+			return False
+
+		if (err_status):
+			if ((int(err_status) == SNMP_ERR_TOOBIG) & (w.max_rep > 1)):
+				# ask for less and try the same block again
+				self._max_rep_cap[w.ip] = w.max_rep * ncols - 1
+				w.max_rep = max(1, w.max_rep / 2)
+				self._max_rep[w.ip] = w.max_rep * ncols
+				self._send_walk(req, w)
+			else:
+				req._complete(None, err_status, err_index)
+			return False
+
+		done = set()
+		rows = 0
+		for r in var_bind_table:
+			row = []
+			for i in xrange(0, ncols):
+				c = w.active[i]
+				if (c in done):
+					continue
+				n, v = r[i]
+				t = tuple(n)
+				oid = w.oids[c]
+				if ((v.tagSet == rfc1905.EndOfMibView.tagSet) | (t[:len(oid)] != oid)):
+					done.add(c)
+					continue
+				if (t <= w.next_oids[c]):
+					# a broken agent would have us walk in circles
+					done.add(c)
+					w.error = 'OID not increasing: %s' % n.prettyPrint()
+					continue
+				w.next_oids[c] = t
+				row.append((n, v))
+			if (len(row) > 0):
+				req.var_binds.append(row)
+			rows += 1
+
+		w.active = [c for c in w.active if (c not in done)]
+		if ((len(w.active) == 0) | (len(var_bind_table) == 0)):
+			req._complete(w.error)
+			return False
+
+		if (rows < w.max_rep):
+			# the agent cut the response to fit its packet size
+			w.max_rep = max(1, rows)
+			self._max_rep_cap[w.ip] = max(1, rows) * ncols
+		else:
+			w.max_rep = w.max_rep * 2
+
+		# share the agent's limit between the columns left
+		cap = self._max_rep_cap.get(w.ip, BULK_MAX_REP_LIMIT)
+		w.max_rep = max(1, min(cap / len(w.active), w.max_rep * ncols / len(w.active)))
+		self._max_rep[w.ip] = w.max_rep * len(w.active)
+
+		self._send_walk(req, w)
+		return False
+
+	#
+	# Engine thread.
+	# Sends queued requests and runs the dispatcher while there is
+	# work outstanding, otherwise sleeps until something is queued.
+	#
+	def _run(self):
+		while True:
+			dispatcher = self._cmdgen.snmpEngine.transportDispatcher
+			busy = ((dispatcher != None) and
+					(dispatcher.jobsArePending() or dispatcher.transportsAreWorking()))
+
+			try:
+				item = self._queue.get(busy == False)
+			except Queue.Empty:
+				item = None
+
+			while (item != None):
+				func, req, args = item
+				try:
+					func(req, *args)
+				except Exception as e:
+					req._complete(str(e))
+				try:
+					item = self._queue.get(False)
+				except Queue.Empty:
+					item = None
+
+			dispatcher = self._cmdgen.snmpEngine.transportDispatcher
+			if (dispatcher == None):
+				continue
+
+			sock_map = dispatcher.getSocketMap()
+			if (self._wakeup == None):
+				self._wakeup = _mnet_snmp_wakeup(sock_map)
+
+			if (dispatcher.jobsArePending() or dispatcher.transportsAreWorking()):
+				asyncore.loop(dispatcher.getTimerResolution(), use_poll = True, map = sock_map, count = 1)
+				dispatcher.handleTimerTick(time.time())
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+#
+# Return the process-wide SNMP engine, starting it if needed.
+#
+def get_snmp_engine():
+	global _engine
+
+	if (_engine == None):
+		with _engine_lock:
+			if (_engine == None):
+				_engine = mnet_snmp_engine()
+
+	return _engine
+
+#
+# Replace the process-wide SNMP engine, e.g. with an
+# mnet_snmp_replay_engine.  Call before any SNMP is done.
+# Returns the engine it replaced, None if there was none yet.
+#
+def set_snmp_engine(engine):
+	global _engine
+
+	with _engine_lock:
+		prev = _engine
+		_engine = engine
+
+	return prev
+
+
+class mnet_snmp_table:
+	'''
+	Rows returned by a bulk walk, indexed by OID tuple.
+	Rows are lists of (OID tuple, value) as decode_var_binds()
+	returns them.
+
+	Iterating gives the rows in walk order like a plain varbind
+	table.  get() is a dict lookup and column() returns the
+	(instance index, value) pairs below a column OID.
+	'''
+	rows = None
+
+	def __init__(self, var_bind_table = None):
+		self.rows = []
+		self._vals = {}
+		self._columns = {}
+
+		if (var_bind_table != None):
+			for row in var_bind_table:
+				self.add_row(row)
+
+	def add_row(self, row):
+		self.rows.append(row)
+		for n, v in row:
+			self._vals[n] = v
+		self._columns = {}
+
+	def __iter__(self):
+		return iter(self.rows)
+
+	def __len__(self):
+		return len(self.rows)
+
+	#
+	# Value at this OID, or None.
+	#
+	def get(self, oid):
+		try:
+			return self._vals.get(oid_to_tuple(oid))
+		except ValueError:
+			return None
+
+	#
+	# Value of this column at this instance index, or None.
+	#
+	def instance(self, column, idx):
+		return self._vals.get(oid_to_tuple(column) + oid_to_tuple(idx))
+
+	#
+	# List of (instance index tuple, value) under this column OID,
+	# in walk order.
+	#
+	def column(self, column):
+		column = oid_to_tuple(column)
+
+		ret = self._columns.get(column)
+		if (ret != None):
+			return ret
+
+		clen = len(column)
+		ret = []
+		for row in self.rows:
+			for n, v in row:
+				if (n[:clen] == column):
+					ret.append((n[clen:], v))
+
+		self._columns[column] = ret
+		return ret
+
+	#
+	# Rows of several columns that share an index, grouped by
+	# instance.  Returns a list of (instance index tuple, [values])
+	# in the walk order of the first column, with None for any
+	# column missing at that instance.
+	#
+	def instances(self, columns):
+		columns = [oid_to_tuple(c) for c in columns]
+
+		ret = []
+		for idx, v in self.column(columns[0]):
+			vals = [v]
+			for c in columns[1:]:
+				vals.append(self._vals.get(c + idx))
+			ret.append((idx, vals))
+
+		return ret
+
+
+class mnet_snmp(object):
+	__slots__ = ('success', 'ver', 'v2_community', 'sys_name', '_ip')
 
 	def __init__(self, ip='0.0.0.0'):
 		self.success = 0
 		self.ver = 0
 		self.v2_community = None
+		self.sys_name = None
 		self._ip = ip
 
 	#
 	# Try to find valid SNMP credentials in the provided list.
 	# Returns 1 if success, 0 if failed.
 	#
-	def get_cred(self, snmp_creds):
-		for cred in snmp_creds:
-			# we don't currently support anything other than SNMPv2
-			if (cred['ver'] != 2):
-				continue
-			
-			community = cred['community']
-
-			cmdGen = cmdgen.CommandGenerator()
-			errIndication, errStatus, errIndex, varBinds = cmdGen.getCmd(
-					cmdgen.CommunityData(community),
-					cmdgen.UdpTransportTarget((self._ip, SNMP_PORT)),
-					'1.3.6.1.2.1.1.5.0',
-					lookupNames = False, lookupValues = True
-			)
-			if errIndication:
-				continue
+	# The credential cred_cache has for this IP is tried on its own
+	# first, then all of the others at once, the one cached for its
+	# /24 leading.  The sysName returned by the winning probe is kept
+	# in .sys_name.
+	#
+	# With dead_cache, hosts that failed recently are not tried at all
+	# and hosts that fail are added to it.  Hosts that never answered
+	# before only get a short probe when dead_cache is kept in a file,
+	# a slow host it misses would be skipped for the whole ttl.
+	#
+	def get_cred(self, snmp_creds, cred_cache = None, dead_cache = None):
+		if (dead_cache != None):
+			if (dead_cache.is_unreachable(self._ip)):
+				return 0
+
+		# we don't currently support anything other than SNMPv2
+		creds = [cred for cred in snmp_creds if (cred['ver'] == 2)]
+
+		known = None
+		if (cred_cache != None):
+			known = cred_cache.lookup(self._ip, creds, subnet = False)
+			if (known != None):
+				# worked on this IP last time, try it alone
+				if (self._probe_creds([known], SNMP_PROBE_TIMEOUT, SNMP_PROBE_RETRIES) == 1):
+					return 1
 			else:
-				self.ver = 2
-				self.success = 1
-				self.v2_community = community
+				cred = cred_cache.lookup(self._ip, creds)
+				if (cred != None):
+					# worked in the same subnet, send it first
+					creds = [cred] + [c for c in creds if (c is not cred)]
+
+		short = 0
+		if ((dead_cache != None) & (known == None)):
+			short = (dead_cache.filename != None)
+
+		if (short):
+			ret = self._probe_creds(creds, SNMP_PROBE_TIMEOUT, SNMP_PROBE_RETRIES)
+		else:
+			ret = self._probe_creds(creds, SNMP_TIMEOUT, SNMP_RETRIES)
+
+		if (ret == 0):
+			if (dead_cache != None):
+				dead_cache.add(self._ip)
+			return 0
+
+		if (cred_cache != None):
+			cred_cache.store(self._ip, {'ver': 2, 'community': self.v2_community})
+
+		return 1
 
-				return 1
+	#
+	# Send a sysName GET with each credential at the same time.
+	# The first one to answer wins; the rest are left to time out.
+	#
+	def _probe_creds(self, creds, timeout, retries):
+		if (len(creds) == 0):
+			return 0
+
+		engine = get_snmp_engine()
+		lock = threading.Lock()
+		finished = threading.Event()
+		state = {'left': len(creds), 'req': None, 'community': None}
+
+		def probe_done(req, community):
+			with lock:
+				state['left'] -= 1
+				if ((state['req'] == None) & (req.err_indication == None)):
+					state['req'] = req
+					state['community'] = community
+				if ((state['req'] != None) | (state['left'] == 0)):
+					finished.set()
+
+		for cred in creds:
+			engine.get(self._ip, cred['community'], [OID_SYSNAME], timeout, retries,
+					cb = lambda req, community = cred['community']: probe_done(req, community))
+
+		finished.wait()
+
+		req = state['req']
+		if (req == None):
+			return 0
+
+		self.ver = 2
+		self.success = 1
+		self.v2_community = state['community']
 
-		return 0
+		if ((req.err_status == 0) & (len(req.var_binds) == 1)):
+			self.sys_name = pretty_val(decode_val(req.var_binds[0][1]))
+
+		return 1
 
 	#
 	# Get single SNMP value at OID.
 	#
 	def get_val(self, oid):
-		cmdGen = cmdgen.CommandGenerator()
-		errIndication, errStatus, errIndex, varBinds = cmdGen.getCmd(
-				cmdgen.CommunityData(self.v2_community),
-				cmdgen.UdpTransportTarget((self._ip, SNMP_PORT), retries=2),
-				oid, lookupNames = False, lookupValues = True
-		)
+		return self.get_vals([oid])[0]
 
-		if errIndication:
-			print '[E] get_snmp_val(%s): %s' % (self.v2_community, errIndication)
-		else:
-			r = varBinds[0][1].prettyPrint()
-			if ((r == OID_ERR) | (r == OID_ERR_INST)):
-				return None
-			return r
 
-		return None
+	#
+	# Get the SNMP values at several OIDs in as few requests as possible.
+	# All of the OIDs are packed into one GET, which is split in half
+	# and retried when the agent answers tooBig.
+	#
+	# Returns a list of values in the same order as oids.
+	# OIDs the agent does not have are None.
+	#
+	def get_vals(self, oids):
+		if (len(oids) == 0):
+			return []
+
+		req = get_snmp_engine().get(self._ip, self.v2_community, oids, retries=2).wait()
+
+		if req.err_indication:
+			print '[E] get_snmp_val(%s): %s' % (self.v2_community, req.err_indication)
+			return [None] * len(oids)
+
+		if req.err_status:
+			# tooBig, or an agent refusing one of the OIDs
+			if (len(oids) == 1):
+				return [None]
+			half = len(oids) / 2
+			return self.get_vals(oids[:half]) + self.get_vals(oids[half:])
+
+		return [pretty_val(decode_val(v)) for n, v in req.var_binds]
 
 
 	#
 	# Get bulk SNMP value at OID.
 	#
-	# Returns 1 on success, 0 on failure.
+	# Returns the rows on success, None on failure.
+	# Rows are lists of (OID tuple, value), see decode_var_binds().
+	# With indexed=True the rows come back as an mnet_snmp_table.
 	#
-	def get_bulk(self, oid):
-		cmdGen = cmdgen.CommandGenerator()
-		errIndication, errStatus, errIndex, varBindTable = cmdGen.bulkCmd(
-				cmdgen.CommunityData(self.v2_community),
-				cmdgen.UdpTransportTarget((self._ip, SNMP_PORT), timeout=30, retries=2),
-				0, 10,
-				oid,
-				lookupNames = False, lookupValues = True
-		)
+	def get_bulk(self, oid, indexed = False):
+		req = get_snmp_engine().walk(self._ip, self.v2_community, oid, retries=2).wait()
 
-		if errIndication:
-			print '[E] get_snmp_bulk(%s): %s' % (self.v2_community, errIndication)
+		if req.err_indication:
+			print '[E] get_snmp_bulk(%s): %s' % (self.v2_community, req.err_indication)
 		else:
-			ret = []
-			for r in varBindTable:
-				for n, v in r:
-					if (n.prettyPrint().startswith(oid) == 0):
-						return ret
-					ret.append(r)
-			return ret
+			rows = [decode_var_binds(row) for row in req.var_binds]
+			if (indexed):
+				return mnet_snmp_table(rows)
+			return rows
 
 		return None
 
 
+	#
+	# Walk only the listed column OIDs, side by side in the same
+	# GETBULK requests.
+	#
+	# Returns an mnet_snmp_table on success, None on failure.
+	# Use instances() on it to read the rows grouped by index.
+	#
+	def get_columns(self, oids):
+		req = get_snmp_engine().walk(self._ip, self.v2_community, oids, retries=2).wait()
+
+		if req.err_indication:
+			print '[E] get_snmp_columns(%s): %s' % (self.v2_community, req.err_indication)
+			return None
+
+		return mnet_snmp_table([decode_var_binds(row) for row in req.var_binds])
+
+
 	#
 	# Lookup a value from the return table of get_bulk()
 	#
 	def cache_lookup(self, varBindTable, name):
+		if (varBindTable == None):
+			return None
+
+		if (isinstance(varBindTable, mnet_snmp_table)):
+			return pretty_val(varBindTable.get(name))
+
+		oid = oid_to_tuple(name)
 		for r in varBindTable:
 			for n, v in r:
-				if (n.prettyPrint() == name):
-					return v.prettyPrint()
+				if (n == oid):
+					return pretty_val(v)
 		return None
 
 
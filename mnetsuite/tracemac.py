@@ -32,19 +32,35 @@ import re
 
 from snmp import *
 from config import mnet_config
+from cache import mnet_cred_cache, mnet_unreachable_cache
 from util import *
 from _version import __version__
 
 class mnet_tracemac:
 	config = None
+	cred_cache = None
+	dead_cache = None
 	nodes = []
 
 	def __init__(self):
 		self.config = mnet_config()
+		self.cred_cache = mnet_cred_cache()
+		self.dead_cache = mnet_unreachable_cache()
 
 	def load_config(self, config_file):
 		if (config_file):
 			self.config.load(config_file)
+			self.cred_cache = mnet_cred_cache(self.config.cache.credentials)
+			self.dead_cache = mnet_unreachable_cache(self.config.cache.unreachable,
+					self.config.cache.unreachable_ttl)
+
+	#
+	# Write the credential and unreachable caches.
+	# Call once the trace is done.
+	#
+	def save_caches(self):
+		self.cred_cache.save()
+		self.dead_cache.save()
 
 	#
 	# Connect to the node at the specified IP and search for the
@@ -56,10 +72,13 @@ class mnet_tracemac:
 		snmpobj = mnet_snmp(ip)
 
 		# find valid credentials for this node
-		if (snmpobj.get_cred(self.config.snmp_creds) == 0):
+		if (snmpobj.get_cred(self.config.snmp_creds, self.cred_cache, self.dead_cache) == 0):
 			return None
 
-		system_name = shorten_host_name(snmpobj.get_val(OID_SYSNAME), self.config.host_domains)
+		system_name = snmpobj.sys_name
+		if (system_name == None):
+			system_name = snmpobj.get_val(OID_SYSNAME)
+		system_name = shorten_host_name(system_name, self.config.host_domains)
 
 		print('%s (%s)' % (system_name, ip))
 
@@ -76,75 +95,67 @@ class mnet_tracemac:
 		self.nodes.append(system_name)
 
 		# cache some common MIB trees
-		vlan_vbtbl	= snmpobj.get_bulk(OID_VLANS)
+		vlan_vbtbl	= snmpobj.get_bulk(OID_VLANS, indexed=True)
+		if (vlan_vbtbl == None):
+			return None
 
-		for vlan_row in vlan_vbtbl:
-			for vlan_n, vlan_v in vlan_row:
-				t = vlan_n.prettyPrint().split('.')
-				vlan = int(t[15])
+		for (vlan_idx, vlan_v) in vlan_vbtbl.column(OID_VLANS):
+			# management domain, VLAN
+			vlan = vlan_idx[1]
 
-				if (vlan >= 1002):
-					continue
+			if (vlan >= 1002):
+				continue
 
-				# change our SNMP credentials
-				old_cred = snmpobj._cred
-				snmpobj._cred['community'] = old_cred['community'] + '@' + str(vlan)
+			# the bridge tables are per VLAN, in community@vlan
+			old_community = snmpobj.v2_community
+			snmpobj.v2_community = old_community + '@' + str(vlan)
 
-				cam_vbtbl = snmpobj.get_bulk(OID_VLAN_CAM)
-				cam_match = None
+			cam_vbtbl = snmpobj.get_bulk(OID_VLAN_CAM, indexed=True)
+			cam_match = None
 
-				for cam_row in cam_vbtbl:
-					for cam_n, cam_v in cam_row:
-						if (mac_addr == cam_v):
-							cam_match = cam_n
-							break
-					if (cam_match != None):
+			if (cam_vbtbl != None):
+				for (cam_idx, cam_v) in cam_vbtbl.column(OID_VLAN_CAM):
+					if (mac_addr == cam_v):
+						cam_match = cam_idx
 						break
 
-				if (cam_match == None):
-					# try next VLAN
-					continue
+			if (cam_match == None):
+				# try next VLAN
+				snmpobj.v2_community = old_community
+				continue
 
-				p = cam_match.prettyPrint().split('.')
-				bridge_portnum = snmpobj.get_val(OID_BRIDGE_PORTNUMS +'.'+p[11]+'.'+p[12]+ '.'+p[13]+'.'+p[14]+'.'+p[15]+'.'+p[16])
+			bridge_portnum = snmpobj.get_val(OID_BRIDGE_PORTNUMS + '.' + '.'.join([str(x) for x in cam_match]))
 
-				ifidx = snmpobj.get_val(OID_IFINDEX + '.' + bridge_portnum)
+			ifidx = snmpobj.get_val(OID_IFINDEX + '.' + bridge_portnum)
 
-				# restore SNMP credentials
-				snmpobj._cred = old_cred
-				
-				port = snmpobj.get_val(OID_IFNAME + '.' + ifidx)
+			# restore SNMP credentials
+			snmpobj.v2_community = old_community
+			
+			port = snmpobj.get_val(OID_IFNAME + '.' + ifidx)
 
-				print('          VLAN: %s' % vlan)
-				print('          Port: %s' % port)
-				
-				# get list of CDP neighbors
-				cdp_vbtbl = snmpobj.get_bulk(OID_CDP)
-				if (cdp_vbtbl == None):
-					return None
+			print('          VLAN: %s' % vlan)
+			print('          Port: %s' % port)
+			
+			# get list of CDP neighbors
+			cdp_vbtbl = snmpobj.get_columns([OID_CDP_DEVID, OID_CDP_IPADDR])
+			if (cdp_vbtbl == None):
+				return None
 
-				for cdp_row in cdp_vbtbl:
-					for cdp_n, cdp_v in cdp_row:
-						# process only if this row is a CDP_DEVID
-						if (cdp_n.prettyPrint().startswith(OID_CDP_DEVID) == 0):
-							continue
-						
-						t = cdp_n.prettyPrint().split('.')
-						if (ifidx != t[14]):
-							continue
+			for (cdp_idx, vals) in cdp_vbtbl.instances([OID_CDP_DEVID, OID_CDP_IPADDR]):
+				if (ifidx != str(cdp_idx[0])):
+					continue
 
-						# get remote IP
-						rip = snmpobj.cache_lookup(cdp_vbtbl, OID_CDP_IPADDR + '.' + ifidx + '.' + t[15])
-						rip = convert_ip_int_str(rip)
+				# get remote IP
+				rip = convert_ip_octets_str(vals[1])
 
-						rname = shorten_host_name(cdp_v.prettyPrint(), self.config.host_domains)
+				rname = shorten_host_name(pretty_val(vals[0]), self.config.host_domains)
 
-						print('     Next Node: %s' % rname)
-						print('  Next Node IP: %s' % rip)
+				print('     Next Node: %s' % rname)
+				print('  Next Node IP: %s' % rip)
 
-						return rip
+				return rip
 
-				return None
+			return None
 
 		print('  MAC not found in CAM table.')
 		return None
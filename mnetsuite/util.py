@@ -28,8 +28,10 @@
 USE_NETADDR = 1 
 
 import re
+import socket
 import struct
 import binascii
+import bisect
 
 from snmp import *
 from config import mnet_config
@@ -75,6 +77,303 @@ def is_ipv4_in_cidr(ip, cidr):
 	return ((cidr_ip & cidr_mb) == (ip & cidr_mb))
 
 
+#
+# Return (IP version, IP as an integer), or None if it can't be parsed.
+#
+def ip_to_int(ip):
+	o = ip.split('.')
+	if (len(o) == 4):
+		try:
+			o = [int(x) for x in o]
+		except ValueError:
+			return None
+		if ((min(o) < 0) | (max(o) > 255)):
+			return None
+		return (4, (o[0] << 24) + (o[1] << 16) + (o[2] << 8) + o[3])
+
+	if (USE_NETADDR):
+		try:
+			ipaddr = IPAddress(ip)
+		except:
+			return None
+		return (ipaddr.version, ipaddr.value)
+
+	return None
+
+
+#
+# Return (IP version, first IP, last IP) of a CIDR as integers,
+# or None if it can't be parsed.
+#
+def cidr_to_range(cidr):
+	if (USE_NETADDR):
+		try:
+			net = IPNetwork(cidr)
+		except:
+			return None
+		return (net.version, net.first, net.last)
+
+	t = cidr.split('/')
+	ip = ip_to_int(t[0])
+	if (ip == None):
+		return None
+
+	try:
+		bits = int(t[1]) if (len(t) > 1) else 32
+	except ValueError:
+		return None
+	if ((bits < 0) | (bits > 32)):
+		return None
+
+	host_mask = (1 << (32 - bits)) - 1
+	first = ip[1] & ~host_mask
+	return (4, first, first | host_mask)
+
+
+#
+# Return the CIDR of the subnet an IP is in, /bits for IPv4
+# and /64 for IPv6, or None if it can't be parsed.
+#
+def ip_subnet(ip, bits):
+	v = ip_to_int(ip)
+	if (v == None):
+		return None
+
+	if (v[0] == 4):
+		bits = max(0, min(bits, 32))
+		host_mask = (1 << (32 - bits)) - 1
+		net = v[1] & ~host_mask
+		return '%i.%i.%i.%i/%i' % ((net >> 24) & 0xFF, (net >> 16) & 0xFF, (net >> 8) & 0xFF, net & 0xFF, bits)
+
+	return str(IPNetwork('%s/64' % ip).cidr)
+
+
+#
+# Return the string form of an address given as IANA address
+# family (1 = IPv4, 2 = IPv6) and its octets, as in the index
+# of InetAddress style tables.  Returns None for anything else.
+#
+def inet_address_str(family, octets):
+	if ((family == 1) & (len(octets) == 4)):
+		return '%i.%i.%i.%i' % tuple(octets)
+
+	if ((family == 2) & (len(octets) == 16)):
+		try:
+			return socket.inet_ntop(socket.AF_INET6, struct.pack('16B', *octets))
+		except (ValueError, struct.error, socket.error):
+			return None
+
+	return None
+
+
+VLAN_COUNT = 4096
+
+# VLANs in each vlanTrunkPortVlansEnabled bitmap
+VLAN_BITMAP_SIZE = 1024
+
+
+#
+# Bits of VLANs first to last, VLAN 0 being the top bit.
+#
+def _vlan_mask(first, last):
+	return ((1 << (last - first + 1)) - 1) << (VLAN_COUNT - 1 - last)
+
+# VLAN 0, 4095 and the FDDI / Token Ring defaults 1002-1005.
+# Devices differ on whether a trunk allowing all VLANs has them set.
+VLANS_RESERVED = _vlan_mask(0, 0) | _vlan_mask(1002, 1005) | _vlan_mask(VLAN_COUNT - 1, VLAN_COUNT - 1)
+
+
+class mnet_vlan_set:
+	'''
+	VLANs allowed on a trunk, kept as one 4096 bit integer
+	with VLAN 0 as the top bit, the same order as the
+	vlanTrunkPortVlansEnabled bitmaps it is read from.
+
+	str() gives the ranges, like "1-10,20,30-40", or "All".
+	Sets compare equal by their VLANs, or to their string.
+	a & b and a - b give the VLANs in both or only in a.
+	'''
+	bits = 0
+
+	def __init__(self, bits = 0):
+		self.bits = bits
+		self._str = None
+
+	#
+	# Build from the 1k, 2k, 3k and 4k bitmaps as octet strings,
+	# None for any the device doesn't have.  Returns the shared
+	# VLANS_ALL if every VLAN the bitmaps cover is allowed.
+	#
+	@staticmethod
+	def from_octets(bitmaps):
+		size = VLAN_BITMAP_SIZE / 8
+		data = []
+		covered = 0
+		for i, b in enumerate(bitmaps):
+			if (b == None):
+				b = ''
+			else:
+				covered = (i + 1) * VLAN_BITMAP_SIZE
+			data.append(b[:size].ljust(size, '\0'))
+
+		if (covered == 0):
+			return VLANS_ALL
+
+		bits = int(binascii.hexlify(''.join(data)).ljust(VLAN_COUNT / 4, '0'), 16)
+
+		# every VLAN covered, whatever the reserved ones are set to
+		if ((bits | VLANS_RESERVED) == (_vlan_mask(0, covered - 1) | VLANS_RESERVED)):
+			return VLANS_ALL
+
+		return mnet_vlan_set(bits)
+
+	#
+	# Build from str() of a set, the way snapshots keep them.
+	#
+	@staticmethod
+	def from_str(s):
+		if (s == 'All'):
+			return VLANS_ALL
+
+		bits = 0
+		if (s != 'None'):
+			for r in s.split(','):
+				first, _, last = r.partition('-')
+				bits |= _vlan_mask(int(first), int(last or first))
+
+		return mnet_vlan_set(bits)
+
+	def __str__(self):
+		if (self._str == None):
+			ranges = []
+			for m in re.finditer('1+', bin(self.bits)[2:].zfill(VLAN_COUNT)):
+				first = m.start()
+				last = m.end() - 1
+				ranges.append(str(first) if (first == last) else '%i-%i' % (first, last))
+			self._str = ','.join(ranges) if len(ranges) else 'None'
+
+		return self._str
+
+	def __repr__(self):
+		return 'mnet_vlan_set(%s)' % self
+
+	def __eq__(self, other):
+		if (isinstance(other, mnet_vlan_set)):
+			return self.bits == other.bits
+		if (isinstance(other, basestring)):
+			return str(self) == other
+		return False
+
+	def __ne__(self, other):
+		return not self.__eq__(other)
+
+	def __hash__(self):
+		return hash(self.bits)
+
+	#
+	# VLANs in this set and not in other.
+	#
+	def __sub__(self, other):
+		return mnet_vlan_set(self.bits & ~other.bits)
+
+	#
+	# VLANs in both sets.
+	#
+	def __and__(self, other):
+		return mnet_vlan_set(self.bits & other.bits)
+
+
+# every VLAN allowed, shared by all the trunks and access ports that have it
+VLANS_ALL = mnet_vlan_set(_vlan_mask(1, VLAN_COUNT - 2))
+VLANS_ALL._str = 'All'
+
+
+class mnet_subnet_filter:
+	'''
+	A list of CIDRs compiled to sorted, merged integer ranges,
+	so checking an IP is a binary search instead of a loop
+	over every CIDR.
+	'''
+	def __init__(self, subnets):
+		self.count = 0
+
+		# IP version -> sorted list of [first, last]
+		ranges = {}
+		for s in subnets:
+			r = cidr_to_range(s)
+			if (r == None):
+				print('[E] Invalid subnet %s' % s)
+				continue
+			ranges.setdefault(r[0], []).append([r[1], r[2]])
+			self.count += 1
+
+		self._ranges = {}
+		self._firsts = {}
+		for ver, rl in ranges.items():
+			rl.sort()
+			merged = [rl[0]]
+			for r in rl[1:]:
+				if (r[0] <= merged[-1][1] + 1):
+					merged[-1][1] = max(merged[-1][1], r[1])
+				else:
+					merged.append(r)
+			self._ranges[ver] = merged
+			self._firsts[ver] = [r[0] for r in merged]
+
+	#
+	# Return 1 if the IP is in one of the subnets.
+	#
+	def contains(self, ip):
+		ip = ip_to_int(ip)
+		if (ip == None):
+			return 0
+
+		ranges = self._ranges.get(ip[0])
+		if (ranges == None):
+			return 0
+
+		i = bisect.bisect_right(self._firsts[ip[0]], ip[1]) - 1
+		if ((i >= 0) and (ip[1] <= ranges[i][1])):
+			return 1
+		return 0
+
+	#
+	# contains() for a list of IPs.
+	# Each IP is parsed once and the ranges are swept once in IP order.
+	#
+	def contains_list(self, ips):
+		found = {}
+		by_ver = {}
+		for ip in set(ips):
+			found[ip] = 0
+			v = ip_to_int(ip)
+			if ((v != None) and (v[0] in self._ranges)):
+				by_ver.setdefault(v[0], []).append((v[1], ip))
+
+		for ver, vals in by_ver.items():
+			ranges = self._ranges[ver]
+			i = 0
+			for v, ip in sorted(vals):
+				while ((i < len(ranges)) and (ranges[i][1] < v)):
+					i += 1
+				if (i == len(ranges)):
+					break
+				if (ranges[i][0] <= v):
+					found[ip] = 1
+
+		return [found[ip] for ip in ips]
+
+
+#
+# Share one copy of strings that repeat on every node and link,
+# like port names, platforms and versions.
+#
+def intern_str(s):
+	if (type(s) == str):
+		return intern(s)
+	return s
+
+
 #
 # Shorten the port name string.
 #
@@ -90,7 +389,7 @@ def shorten_port_name(port):
 		port = port.replace('Gi', 'gi')
 		port = port.replace('Fa', 'fa')
 
-	return port
+	return intern_str(port)
 
 
 #
@@ -118,12 +417,11 @@ def shorten_host_name(host, domains):
 
 #
 # Return a string representation of an IPv4 address
+# given as its 4 octets.
 #
-def convert_ip_int_str(iip):
-	if ((iip != None) & (iip != '')):
-		ip = int(iip, 0)
-		ip = '%i.%i.%i.%i' % (((ip >> 24) & 0xFF), ((ip >> 16) & 0xFF), ((ip >> 8) & 0xFF), (ip & 0xFF))
-		return ip
+def convert_ip_octets_str(octets):
+	if ((octets != None) and (len(octets) == 4)):
+		return socket.inet_ntoa(octets)
 
 	return 'UNKNOWN'
 
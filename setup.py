@@ -50,7 +50,6 @@ setup(
 
 	install_requires = [
 		'pysnmp>=4.2.5',
-		'pydot2',
 		'netaddr>=0.7.14'
 	]
 )